@@ -0,0 +1,57 @@
+from logging.config import fileConfig
+
+from sqlalchemy import engine_from_config, pool, text
+
+from alembic import context
+
+# This is the Alembic Config object, which provides
+# access to the values within the .ini file in use.
+config = context.config
+
+# Interpret the config file for Python logging.
+# This line sets up loggers basically.
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Like the main database, the message queue shards
+# are managed with manual migrations only.
+target_metadata = None
+
+
+def run_migrations_offline() -> None:
+    """Run migrations in 'offline' mode."""
+    raise NotImplementedError("Offline migrations are not supported")
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
+
+    Every shard is migrated separately: its URL is passed as
+    the ``url`` argument (``-x url=...``) to Alembic, and
+    defaults to the ``sqlalchemy.url`` of the ini section.
+
+    """
+    section = config.get_section(config.config_ini_section, {})
+    url = context.get_x_argument(as_dictionary=True).get("url")
+    if url:
+        section["sqlalchemy.url"] = url
+    connectable = engine_from_config(
+        section,
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        # Ensure that Alembic finds its own table in the public schema.
+        connection.execute(text("SET search_path TO public"))
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,160 @@
+"""Keep the results and workflows of dead messages
+
+Revision ID: 3c91d0a7b2e4
+Revises: 55032be99df2
+Create Date: 2026-10-19 22:34:10.528163+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c91d0a7b2e4"
+down_revision: Union[str, None] = "55032be99df2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # Dead messages keep the exception which the Results middleware stores for them, like in the main
+    # database. Messages of workflows remain in the main database, but the functions below are the same
+    # as the main database's and move the `workflow_id` of messages into the dead-letter table and back.
+    op.execute(
+        sa.text(
+            """
+            alter table data.dramatiq_queue add column workflow_id uuid;
+            alter table data.dramatiq_dead_letter
+                add column result jsonb compression lz4,
+                add column workflow_id uuid;
+            update data.dramatiq_dead_letter d
+                set result = q.result
+                from data.dramatiq_queue q
+                where q.message_id = d.message_id and q.queue_name = '__RQ__';
+            delete from data.dramatiq_queue q
+                using data.dramatiq_dead_letter d
+                where q.message_id = d.message_id and q.queue_name = '__RQ__';
+            """
+        )
+    )
+
+    # Move rejected messages into the dead-letter table, without the fields that are columns of the
+    # dead-letter table anyway. The message keeps its workflow, such that requeueing it continues the
+    # workflow.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter() returns trigger language plpgsql as $$
+                begin
+                    insert into data.dramatiq_dead_letter as d
+                        (message_id, user_id, workflow_id, queue_name, actor_name, retries, reason, traceback, message)
+                        values (
+                            new.message_id,
+                            new.user_id,
+                            new.workflow_id,
+                            new.queue_name,
+                            new.message->>'actor_name',
+                            coalesce((new.message->'options'->>'retries')::integer, 0),
+                            new.message->'options'->>'reason',
+                            new.message->'options'->>'traceback',
+                            new.message - '{message_id, queue_name, actor_name}'::text[]
+                                #- '{options,retries}' #- '{options,reason}' #- '{options,traceback}' #- '{options,requeue_timestamp}'
+                        )
+                        on conflict (message_id) do update set
+                            workflow_id = excluded.workflow_id,
+                            retries = excluded.retries,
+                            reason = excluded.reason,
+                            traceback = excluded.traceback,
+                            failed_at = excluded.failed_at,
+                            message = excluded.message;
+                    delete from data.dramatiq_queue where message_id = new.message_id;
+                    return null;
+                end;
+            $$;
+            create or replace trigger dramatiq_dead_letter
+                after update of state on data.dramatiq_queue
+                for each row
+                when (new.state = 'rejected' and old.state <> 'rejected')
+                execute function data.dramatiq_dead_letter();
+            """
+        )
+    )
+
+    # The Results middleware stores the exception of a rejected message after the message was moved
+    # into the dead-letter table. Dramatiq-PG then inserts a new row, without user or workflow, into
+    # the queue table for the result; keep the result with the dead message instead.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter_result() returns trigger language plpgsql as $$
+                begin
+                    update data.dramatiq_dead_letter set result = new.result where message_id = new.message_id;
+                    if found then
+                        delete from data.dramatiq_queue where message_id = new.message_id;
+                    end if;
+                    return null;
+                end;
+            $$;
+            create or replace trigger dramatiq_dead_letter_result
+                after insert on data.dramatiq_queue
+                for each row
+                when (new.queue_name = '__RQ__')
+                execute function data.dramatiq_dead_letter_result();
+            """
+        )
+    )
+
+    # Requeue the given dead messages, or all of them, putting their fields back into the messages.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.requeue_dead_letters(message_ids uuid[] default null) returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_dead_letter
+                        where requeue_dead_letters.message_ids is null
+                            or message_id = any(requeue_dead_letters.message_ids)
+                        returning message_id, user_id, workflow_id, queue_name, actor_name, message
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, workflow_id, message_id, queue_name, state, mtime, message)
+                        select
+                            d.user_id,
+                            d.workflow_id,
+                            d.message_id,
+                            d.queue_name,
+                            'queued',
+                            now(),
+                            d.message || jsonb_build_object('message_id', d.message_id, 'queue_name', d.queue_name, 'actor_name', d.actor_name)
+                        from dead d
+                        on conflict (message_id) do update set
+                            user_id = excluded.user_id,
+                            workflow_id = excluded.workflow_id,
+                            queue_name = excluded.queue_name,
+                            state = excluded.state,
+                            mtime = excluded.mtime,
+                            message = excluded.message,
+                            result = null,
+                            result_ttl = null
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$;
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,327 @@
+"""Message queue shard
+
+Revision ID: 55032be99df2
+Revises:
+Create Date: 2026-10-19 20:07:43.581206+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "55032be99df2"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # A shard holds only the message queue tables, there are no users, uploads or workflows here:
+    # the main database routes new messages into the shards (see the main database's migrations)
+    # and Dramatiq workers consume from the main database and all shards. The tables and functions
+    # below are the same as the main database's, except that they don't reference other tables; the
+    # `tests/db/test_queue_functions.py` test compares the functions of both databases.
+    op.execute(sa.text("alter default privileges revoke execute on functions from public"))
+
+    # The `dramatiq` role is used by the Dramatiq workers, and the `queue_router` role by the main
+    # database to insert messages into this shard and to read the jobs of a user.
+    op.execute(
+        sa.text(
+            """
+            create schema data;
+            create role dramatiq login password 'dramatiq' noinherit;
+            create role queue_router login password 'queue_router' noinherit;
+            grant usage on schema data to dramatiq, queue_router;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create table data.dramatiq_queue(
+                message_id uuid primary key,
+                user_id bigint,
+                queue_name text not null,
+                state text not null check (state in ('queued', 'consumed', 'rejected', 'done')),
+                mtime timestamp with time zone,
+                message jsonb,
+                result jsonb,
+                result_ttl timestamp with time zone,
+                worker_id text
+            ) with (toast_tuple_target = 256);
+            alter table data.dramatiq_queue
+                alter column message set compression lz4,
+                alter column message set storage main,
+                alter column result set compression lz4,
+                alter column result set storage main;
+            create index dramatiq_queue_user_id_idx on data.dramatiq_queue (user_id) where user_id is not null;
+            create index dramatiq_queue_worker_id_idx on data.dramatiq_queue (worker_id) where state = 'consumed';
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create table data.dramatiq_dead_letter(
+                message_id uuid primary key,
+                user_id bigint,
+                queue_name text not null,
+                actor_name text not null,
+                retries integer not null default 0,
+                reason text compression lz4,
+                traceback text compression lz4,
+                failed_at timestamp with time zone not null default now(),
+                message jsonb compression lz4 not null
+            );
+            create index dramatiq_dead_letter_user_id_idx on data.dramatiq_dead_letter (user_id) where user_id is not null;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create table data.dramatiq_worker(
+                worker_id text primary key,
+                hostname text not null,
+                pid integer not null,
+                started_at timestamp with time zone not null default now(),
+                heartbeat_at timestamp with time zone not null default now(),
+                expires_at timestamp with time zone not null,
+                draining boolean not null default false
+            )
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            grant all privileges on table data.dramatiq_queue, data.dramatiq_dead_letter, data.dramatiq_worker to dramatiq;
+            grant select, insert on data.dramatiq_queue to queue_router;
+            grant select on data.dramatiq_dead_letter to queue_router;
+            """
+        )
+    )
+
+    # Messages which the main database inserts into this shard notify the listening workers. The
+    # notification is sent when the main database's transaction commits, because the foreign data
+    # wrapper commits its remote transaction together with the local one. Dramatiq-PG's own enqueue
+    # notifies already, so the trigger fires only for the inserts of the `queue_router` role.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_queue_notify() returns trigger language plpgsql as $$
+                begin
+                    perform pg_notify('dramatiq.' || new.queue_name || '.enqueue', jsonb_build_object('message_id', new.message_id)::text);
+                    return null;
+                end;
+            $$;
+            create trigger dramatiq_queue_notify
+                after insert on data.dramatiq_queue
+                for each row
+                when (new.state = 'queued' and current_user = 'queue_router')
+                execute function data.dramatiq_queue_notify();
+            """
+        )
+    )
+
+    # Tag consumed messages with their worker. When a consumed message goes back into the queue (i.e.
+    # Dramatiq-PG requeues prefetched messages on worker shutdown, or the message was reclaimed from a
+    # dead worker) notify listening workers, which Dramatiq-PG itself doesn't do. Without that
+    # notification the message would wait for the next poll of the queue table.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_queue_state() returns trigger language plpgsql as $$
+                begin
+                    if new.state = 'consumed' then
+                        new.worker_id = current_setting('application_name');
+                    elsif new.state = 'queued' and old.state = 'consumed' then
+                        new.worker_id = null;
+                        perform pg_notify(
+                            'dramatiq.' || new.queue_name || '.enqueue',
+                            jsonb_build_object('message_id', new.message_id)::text
+                        );
+                    end if;
+                    return new;
+                end;
+            $$;
+            create or replace trigger dramatiq_queue_state
+                before update of state on data.dramatiq_queue
+                for each row
+                execute function data.dramatiq_queue_state();
+            """
+        )
+    )
+
+    # The Retries middleware adds the traceback of the failed attempt to the options of a message that
+    # is going to be retried; only the traceback of the last attempt matters, so strip tracebacks from
+    # requeued messages.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_queue_compact() returns trigger language plpgsql as $$
+                begin
+                    new.message = new.message #- '{options,traceback}';
+                    return new;
+                end;
+            $$;
+            create or replace trigger dramatiq_queue_compact
+                before insert or update of message on data.dramatiq_queue
+                for each row
+                when (new.state = 'queued' and new.message->'options' ? 'traceback')
+                execute function data.dramatiq_queue_compact();
+            """
+        )
+    )
+
+    # Move rejected messages into the dead-letter table, without the fields that are columns of the
+    # dead-letter table anyway.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter() returns trigger language plpgsql as $$
+                begin
+                    insert into data.dramatiq_dead_letter as d
+                        (message_id, user_id, queue_name, actor_name, retries, reason, traceback, message)
+                        values (
+                            new.message_id,
+                            new.user_id,
+                            new.queue_name,
+                            new.message->>'actor_name',
+                            coalesce((new.message->'options'->>'retries')::integer, 0),
+                            new.message->'options'->>'reason',
+                            new.message->'options'->>'traceback',
+                            new.message - '{message_id, queue_name, actor_name}'::text[]
+                                #- '{options,retries}' #- '{options,reason}' #- '{options,traceback}' #- '{options,requeue_timestamp}'
+                        )
+                        on conflict (message_id) do update set
+                            retries = excluded.retries,
+                            reason = excluded.reason,
+                            traceback = excluded.traceback,
+                            failed_at = excluded.failed_at,
+                            message = excluded.message;
+                    delete from data.dramatiq_queue where message_id = new.message_id;
+                    return null;
+                end;
+            $$;
+            create or replace trigger dramatiq_dead_letter
+                after update of state on data.dramatiq_queue
+                for each row
+                when (new.state = 'rejected' and old.state <> 'rejected')
+                execute function data.dramatiq_dead_letter();
+            """
+        )
+    )
+
+    # Requeue the given dead messages, or all of them, putting their fields back into the messages.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.requeue_dead_letters(message_ids uuid[] default null) returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_dead_letter
+                        where requeue_dead_letters.message_ids is null
+                            or message_id = any(requeue_dead_letters.message_ids)
+                        returning message_id, user_id, queue_name, actor_name, message
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message)
+                        select
+                            d.user_id,
+                            d.message_id,
+                            d.queue_name,
+                            'queued',
+                            now(),
+                            d.message || jsonb_build_object('message_id', d.message_id, 'queue_name', d.queue_name, 'actor_name', d.actor_name)
+                        from dead d
+                        on conflict (message_id) do update set
+                            user_id = excluded.user_id,
+                            queue_name = excluded.queue_name,
+                            state = excluded.state,
+                            mtime = excluded.mtime,
+                            message = excluded.message,
+                            result = null,
+                            result_ttl = null
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$;
+            """
+        )
+    )
+
+    # Register or update the heartbeat of a worker. Once a worker is draining, it remains draining.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_heartbeat(worker_id text, hostname text, pid integer, ttl interval, draining boolean default false) returns void language sql as $$
+                insert into data.dramatiq_worker as w (worker_id, hostname, pid, heartbeat_at, expires_at, draining)
+                    values (
+                        dramatiq_heartbeat.worker_id,
+                        dramatiq_heartbeat.hostname,
+                        dramatiq_heartbeat.pid,
+                        now(),
+                        now() + dramatiq_heartbeat.ttl,
+                        dramatiq_heartbeat.draining
+                    )
+                    on conflict (worker_id) do update set
+                        heartbeat_at = excluded.heartbeat_at,
+                        expires_at = excluded.expires_at,
+                        draining = w.draining or excluded.draining
+            $$;
+            """
+        )
+    )
+
+    # Reclaim the messages of dead workers: a worker is dead if its heartbeat expired and none of its
+    # db connections are left. Its consumed messages are requeued, which notifies the listening workers.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_reclaim() returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_worker w
+                        where w.expires_at < now()
+                            and not exists (select from pg_stat_activity a where a.application_name = w.worker_id)
+                        returning w.worker_id
+                )
+                update data.dramatiq_queue q
+                    set state = 'queued'
+                    from dead d
+                    where q.worker_id = d.worker_id and q.state = 'consumed'
+                    returning q.message_id
+            $$;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            grant execute on function data.requeue_dead_letters to dramatiq;
+            grant execute on function data.dramatiq_heartbeat to dramatiq;
+            grant execute on function data.dramatiq_reclaim to dramatiq;
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,183 @@
+"""Dead-letter queue for failed messages
+
+Revision ID: 0acab19dc362
+Revises: 7ce2fd1a52c8
+Create Date: 2026-10-19 09:12:41.518240+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0acab19dc362"
+down_revision: Union[str, None] = "7ce2fd1a52c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # The `dramatiq_dead_letter` table holds messages which Dramatiq failed for good, i.e. their
+    # retries were exhausted or the actor raised one of its `throws` exceptions. Keeping them out
+    # of the `dramatiq_queue` table keeps the hot queue table small, and no worker ever looks at
+    # these messages again unless they're explicitly requeued (see below). The failure reason and
+    # traceback are taken from the message options, see `template_jobs.dead_letter.DeadLetter`.
+    op.execute(
+        sa.text(
+            """
+            create table data.dramatiq_dead_letter(
+                message_id uuid primary key,
+                user_id bigint references auth.user(id),
+                queue_name text not null,
+                actor_name text not null,
+                retries integer not null default 0,
+                reason text,
+                traceback text,
+                failed_at timestamp with time zone not null default now(),
+                message jsonb not null
+            )
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            grant select on data.dramatiq_dead_letter to apiuser;
+            grant all privileges on table data.dramatiq_dead_letter to dramatiq;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            alter table data.dramatiq_dead_letter enable row level security;
+            create policy user_dead_letter_policy on data.dramatiq_dead_letter to apiuser, dramatiq
+                using (
+                    current_role = 'dramatiq'
+                    or user_id = (
+                        select id
+                            from auth.user
+                            where email = (select current_setting('request.jwt.claims', true)::json->>'email')
+                    )
+                );
+            """
+        )
+    )
+
+    # When Dramatiq-PG nacks a message it sets the message's state to `rejected`. This trigger then
+    # moves the message from the queue into the dead-letter table. Note that the Results middleware
+    # stores the exception afterwards, which inserts a new row into the queue table without a user.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_dead_letter() returns trigger language plpgsql as $$
+                begin
+                    insert into data.dramatiq_dead_letter as d
+                        (message_id, user_id, queue_name, actor_name, retries, reason, traceback, message)
+                        values (
+                            new.message_id,
+                            new.user_id,
+                            new.queue_name,
+                            new.message->>'actor_name',
+                            coalesce((new.message->'options'->>'retries')::integer, 0),
+                            new.message->'options'->>'reason',
+                            new.message->'options'->>'traceback',
+                            new.message
+                        )
+                        on conflict (message_id) do update set
+                            retries = excluded.retries,
+                            reason = excluded.reason,
+                            traceback = excluded.traceback,
+                            failed_at = excluded.failed_at,
+                            message = excluded.message;
+                    delete from data.dramatiq_queue where message_id = new.message_id;
+                    return null;
+                end;
+            $$
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create trigger dramatiq_dead_letter
+                after update of state on data.dramatiq_queue
+                for each row
+                when (new.state = 'rejected' and old.state <> 'rejected')
+                execute function data.dramatiq_dead_letter();
+            """
+        )
+    )
+
+    # Move dead messages back into the queue, either all of them (if no ids are given) or the
+    # given ones. Retry counters and failure details are reset such that the messages go through
+    # their actor's full retry policy again. An existing queue row for the same message (e.g. the
+    # stored exception result) is overwritten.
+    op.execute(
+        sa.text(
+            """
+            create function data.requeue_dead_letters(message_ids uuid[] default null) returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_dead_letter
+                        where requeue_dead_letters.message_ids is null
+                            or message_id = any(requeue_dead_letters.message_ids)
+                        returning message_id, user_id, queue_name, message
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message)
+                        select
+                            d.user_id,
+                            d.message_id,
+                            d.queue_name,
+                            'queued',
+                            now(),
+                            d.message #- '{options,retries}' #- '{options,traceback}' #- '{options,reason}' #- '{options,requeue_timestamp}'
+                        from dead d
+                        on conflict (message_id) do update set
+                            user_id = excluded.user_id,
+                            queue_name = excluded.queue_name,
+                            state = excluded.state,
+                            mtime = excluded.mtime,
+                            message = excluded.message,
+                            result = null,
+                            result_ttl = null
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$
+            """
+        )
+    )
+
+    op.execute(sa.text("grant execute on function data.requeue_dead_letters to dramatiq"))
+
+    # Dead messages remain visible to their owners as rejected jobs.
+    op.execute(
+        sa.text(
+            """
+            create or replace view api.job with (security_invoker = true) as
+                select message_id as job_id, state, result from data.dramatiq_queue
+                union all
+                select message_id as job_id, 'rejected' as state, null::jsonb as result from data.dramatiq_dead_letter
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,98 @@
+"""Restrict the options of workflow steps
+
+Revision ID: 17730e5b458b
+Revises: 53cc65d26c9b
+Create Date: 2026-10-19 21:12:36.904217+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "17730e5b458b"
+down_revision: Union[str, None] = "53cc65d26c9b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # Build a workflow step from a client's step: only its `actor_name`, `args` and `kwargs` and the
+    # `pipe_ignore` option are taken. Other Dramatiq options must not be set by clients because the
+    # workers trust them, e.g. `pipe_target` or `on_failure` would run actors which aren't listed in
+    # `data.dramatiq_actor`, or `eta` would delay the message; a step with any other option is rejected.
+    op.execute(
+        sa.text(
+            """
+            create function data.workflow_step(step jsonb) returns jsonb language plpgsql stable as $$
+                declare
+                    queue_name_ text;
+                begin
+                    if jsonb_typeof(step) is distinct from 'object'
+                        or jsonb_typeof(coalesce(step->'args', jsonb_build_array())) <> 'array'
+                        or jsonb_typeof(coalesce(step->'kwargs', jsonb_build_object())) <> 'object'
+                        or jsonb_typeof(coalesce(step->'options', jsonb_build_object())) <> 'object' then
+                        raise invalid_parameter_value using message = 'invalid workflow step';
+                    end if;
+                    if exists (select from jsonb_object_keys(step->'options') k where k <> 'pipe_ignore') then
+                        raise invalid_parameter_value using message = 'unsupported workflow step option';
+                    end if;
+                    select a.queue_name from data.dramatiq_actor a where a.actor_name = step->>'actor_name' into queue_name_;
+                    if not found then
+                        raise invalid_parameter_value using message = 'unknown actor';
+                    end if;
+                    return jsonb_build_object(
+                        'actor_name', step->'actor_name',
+                        'queue_name', queue_name_,
+                        'args', coalesce(step->'args', jsonb_build_array()),
+                        'kwargs', coalesce(step->'kwargs', jsonb_build_object()),
+                        'options', case
+                            when step->'options' ? 'pipe_ignore'
+                            then jsonb_build_object('pipe_ignore', (step->'options'->>'pipe_ignore')::boolean)
+                            else jsonb_build_object()
+                        end
+                    );
+                end;
+            $$;
+            grant execute on function data.workflow_step to apiuser;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create or replace function api.workflow(kind text, steps jsonb, callback jsonb default null) returns record language plpgsql as $$
+                declare
+                    user_id_ bigint;
+                    steps_ jsonb;
+                    callback_ jsonb;
+                    ret record;
+                begin
+                    select id from auth.user where email = current_setting('request.jwt.claims', true)::json->>'email' into user_id_;
+                    if jsonb_typeof(steps) is distinct from 'array' then
+                        raise invalid_parameter_value using message = 'workflow requires an array of steps';
+                    end if;
+                    select jsonb_agg(data.workflow_step(s.step) order by s.ord)
+                        from jsonb_array_elements(steps) with ordinality as s(step, ord)
+                        into steps_;
+                    if callback is not null then
+                        callback_ := data.workflow_step(callback);
+                    end if;
+                    select data.create_workflow(user_id_, kind, steps_, callback_) as workflow_id into ret;
+                    return ret;
+                end;
+            $$
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,49 @@
+"""Continue failed workflows once none of their messages is dead
+
+Revision ID: 2d8f6a1c5b37
+Revises: c4e2b7a9d013
+Create Date: 2026-10-19 23:18:27.604519+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "2d8f6a1c5b37"
+down_revision: Union[str, None] = "c4e2b7a9d013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # A failed workflow continues only once all of its dead messages were requeued, either together or
+    # one after the other; requeueing one of several dead messages of a group leaves the group failed.
+    # The requeued messages were deleted from the dead-letter table by the time this trigger runs.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_workflow_continue() returns trigger language plpgsql as $$
+                begin
+                    update data.workflow w
+                        set state = 'running', finished_at = null
+                        where w.id = new.workflow_id
+                            and w.state = 'failed'
+                            and not exists (select from data.dramatiq_dead_letter d where d.workflow_id = w.id);
+                    return null;
+                end;
+            $$;
+            create index dramatiq_dead_letter_workflow_id_idx on data.dramatiq_dead_letter (workflow_id) where workflow_id is not null;
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,210 @@
+"""Message queue shards
+
+Revision ID: 53cc65d26c9b
+Revises: e5800349124f
+Create Date: 2026-10-19 20:04:11.296470+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "53cc65d26c9b"
+down_revision: Union[str, None] = "e5800349124f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # The message queue can be spread over additional Postgres instances, the queue shards, such that
+    # queue traffic doesn't compete with the auth and profile queries of this database. A shard holds
+    # only the message queue tables (see the `alembic/queue/` migrations) and this database accesses
+    # them through foreign tables.
+    # See also: https://www.postgresql.org/docs/current/postgres-fdw.html
+    op.execute(sa.text("create extension postgres_fdw"))
+
+    # The `queue_shard` table lists the shards of each message queue. Messages of a queue without
+    # shards remain in this database. A shard's name is also the name of its foreign server and of
+    # the schema which contains its foreign tables.
+    op.execute(
+        sa.text(
+            """
+            create table data.queue_shard(
+                shard text not null,
+                queue_name text not null,
+                primary key (queue_name, shard)
+            );
+            grant select on data.queue_shard to apiuser, dramatiq;
+            """
+        )
+    )
+
+    # Register a shard for the given message queues, or update its connection. Only the database owner
+    # can call this function, e.g. `select data.add_queue_shard('shard_1', '{job_q}', 'postgres-queue-1',
+    # 5432, 'queue_db', 'queue_router')`. Users may insert messages into the shard's queue table but can't
+    # read the foreign tables, which have no row-level security; they see their jobs through `api.job`.
+    op.execute(
+        sa.text(
+            """
+            create function data.add_queue_shard(
+                shard text,
+                queue_names text[],
+                host text,
+                port integer,
+                dbname text,
+                password text
+            ) returns void language plpgsql as $$
+                begin
+                    if add_queue_shard.shard !~ '^shard_[a-z0-9_]+$' then
+                        raise invalid_parameter_value using message = 'invalid shard name';
+                    end if;
+                    insert into data.queue_shard (shard, queue_name)
+                        select add_queue_shard.shard, q from unnest(add_queue_shard.queue_names) q
+                        on conflict do nothing;
+                    execute format('create server if not exists %I foreign data wrapper postgres_fdw', shard);
+                    execute format('alter server %I options (host %L, port %L, dbname %L)', shard, host, port, dbname);
+                    execute format('drop user mapping if exists for public server %I', shard);
+                    execute format('create user mapping for public server %I options (user %L, password %L)', shard, 'queue_router', password);
+                    execute format('drop schema if exists %I cascade', shard);
+                    execute format('create schema %I', shard);
+                    execute format('import foreign schema data limit to (dramatiq_queue, dramatiq_dead_letter) from server %1$I into %1$I', shard);
+                    execute format('grant usage on schema %I to apiuser, dramatiq', shard);
+                    execute format('grant insert on %I.dramatiq_queue to apiuser, dramatiq', shard);
+                end;
+            $$
+            """
+        )
+    )
+
+    # Messages are routed to the shards of their queue by user id, such that all jobs of a user live in
+    # the same shard. Messages of workflows remain in this database because the workflow trigger needs
+    # them, and so do messages of queues without shards. The shard notifies its workers of the message.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.enqueue(
+                user_id bigint,
+                queue_name text,
+                actor_name text,
+                args jsonb default jsonb_build_array(),
+                kwargs jsonb default jsonb_build_object(),
+                options jsonb default jsonb_build_object(),
+                workflow_id uuid default null
+            ) returns uuid language plpgsql as $$
+                declare
+                    traceparent_ text[] := string_to_array(
+                        coalesce(
+                            nullif(current_setting('app.traceparent', true), ''),
+                            nullif(current_setting('request.headers', true), '')::json->>'traceparent',
+                            ''
+                        ),
+                        '-'
+                    );
+                    message_id_ uuid := gen_random_uuid();
+                    message_timestamp_ bigint := extract(epoch from now())::bigint;
+                    message_ jsonb;
+                    shard_ text;
+                begin
+                    message_ := jsonb_build_object(
+                        'queue_name', enqueue.queue_name,  -- Dramatiq message queue name.
+                        'actor_name', enqueue.actor_name,  -- Dramatiq actor function.
+                        'args', enqueue.args,  -- Positional args for function.
+                        'kwargs', enqueue.kwargs,  -- Keyword args for function.
+                        'options', enqueue.options || jsonb_build_object(  -- Additional Dramatiq broker options.
+                            'trace', jsonb_strip_nulls(jsonb_build_object(
+                                'trace_id', coalesce(nullif(traceparent_[2], ''), replace(gen_random_uuid()::text, '-', '')),
+                                'parent_span_id', nullif(traceparent_[3], ''),
+                                'request_at', extract(epoch from now()) * 1000,
+                                'enqueued_at', extract(epoch from clock_timestamp()) * 1000
+                            ))
+                        ),
+                        'message_id', message_id_,
+                        'message_timestamp', message_timestamp_
+                    );
+                    if enqueue.workflow_id is null then
+                        select (array_agg(s.shard order by s.shard))[1 + coalesce(enqueue.user_id, 0) % nullif(count(*), 0)]
+                            from data.queue_shard s
+                            where s.queue_name = enqueue.queue_name
+                            into shard_;
+                    end if;
+                    if shard_ is null then
+                        insert into data.dramatiq_queue (user_id, workflow_id, message_id, queue_name, state, mtime, message)
+                            values (
+                                enqueue.user_id,
+                                enqueue.workflow_id,
+                                message_id_,
+                                enqueue.queue_name,
+                                'queued',
+                                to_timestamp(message_timestamp_),
+                                message_
+                            );
+                        perform pg_notify('dramatiq.' || enqueue.queue_name || '.enqueue', jsonb_build_object('message_id', message_id_)::text);
+                    else
+                        execute format(
+                            'insert into %I.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message) values ($1, $2, $3, $4, $5, $6)',
+                            shard_
+                        ) using enqueue.user_id, message_id_, enqueue.queue_name, 'queued', to_timestamp(message_timestamp_), message_;
+                    end if;
+                    return message_id_;
+                end;
+            $$
+            """
+        )
+    )
+
+    # The jobs of the current user in all shards. Foreign tables have no row-level security and users
+    # can't read them, so this function runs with the privileges of its owner and filters by user.
+    op.execute(
+        sa.text(
+            """
+            create function data.shard_jobs() returns table(job_id uuid, state text, result jsonb)
+                language plpgsql stable security definer set search_path = '' as $$
+                declare
+                    user_id_ bigint;
+                    shard_ text;
+                begin
+                    select id
+                        from auth.user
+                        where email = current_setting('request.jwt.claims', true)::json->>'email'
+                        into user_id_;
+                    if user_id_ is null then
+                        return;
+                    end if;
+                    for shard_ in select distinct s.shard from data.queue_shard s order by s.shard loop
+                        return query execute format(
+                            'select message_id, state, result from %1$I.dramatiq_queue where user_id = $1
+                                union all
+                                select message_id, ''rejected'', null::jsonb from %1$I.dramatiq_dead_letter where user_id = $1',
+                            shard_
+                        ) using user_id_;
+                    end loop;
+                end;
+            $$;
+            grant execute on function data.shard_jobs to apiuser;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create or replace view api.job with (security_invoker = true) as
+                select message_id as job_id, state, result from data.dramatiq_queue
+                union all
+                select message_id as job_id, 'rejected' as state, null::jsonb as result from data.dramatiq_dead_letter
+                union all
+                select job_id, state, result from data.shard_jobs()
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,209 @@
+"""Shared message queue functions
+
+Revision ID: 6bb974307c1f
+Revises: 17730e5b458b
+Create Date: 2026-10-19 21:48:05.118392+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6bb974307c1f"
+down_revision: Union[str, None] = "17730e5b458b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # The functions and triggers of the message queue tables are the same in the queue shards, whose
+    # migration creates them with the same definitions. Their behavior is unchanged; recreating them
+    # here makes their definitions identical to the shards' such that the tests can compare them.
+
+    # Tag consumed messages with their worker. When a consumed message goes back into the queue (i.e.
+    # Dramatiq-PG requeues prefetched messages on worker shutdown, or the message was reclaimed from a
+    # dead worker) notify listening workers, which Dramatiq-PG itself doesn't do. Without that
+    # notification the message would wait for the next poll of the queue table.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_queue_state() returns trigger language plpgsql as $$
+                begin
+                    if new.state = 'consumed' then
+                        new.worker_id = current_setting('application_name');
+                    elsif new.state = 'queued' and old.state = 'consumed' then
+                        new.worker_id = null;
+                        perform pg_notify(
+                            'dramatiq.' || new.queue_name || '.enqueue',
+                            jsonb_build_object('message_id', new.message_id)::text
+                        );
+                    end if;
+                    return new;
+                end;
+            $$;
+            create or replace trigger dramatiq_queue_state
+                before update of state on data.dramatiq_queue
+                for each row
+                execute function data.dramatiq_queue_state();
+            """
+        )
+    )
+
+    # The Retries middleware adds the traceback of the failed attempt to the options of a message that
+    # is going to be retried; only the traceback of the last attempt matters, so strip tracebacks from
+    # requeued messages.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_queue_compact() returns trigger language plpgsql as $$
+                begin
+                    new.message = new.message #- '{options,traceback}';
+                    return new;
+                end;
+            $$;
+            create or replace trigger dramatiq_queue_compact
+                before insert or update of message on data.dramatiq_queue
+                for each row
+                when (new.state = 'queued' and new.message->'options' ? 'traceback')
+                execute function data.dramatiq_queue_compact();
+            """
+        )
+    )
+
+    # Move rejected messages into the dead-letter table, without the fields that are columns of the
+    # dead-letter table anyway.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter() returns trigger language plpgsql as $$
+                begin
+                    insert into data.dramatiq_dead_letter as d
+                        (message_id, user_id, queue_name, actor_name, retries, reason, traceback, message)
+                        values (
+                            new.message_id,
+                            new.user_id,
+                            new.queue_name,
+                            new.message->>'actor_name',
+                            coalesce((new.message->'options'->>'retries')::integer, 0),
+                            new.message->'options'->>'reason',
+                            new.message->'options'->>'traceback',
+                            new.message - '{message_id, queue_name, actor_name}'::text[]
+                                #- '{options,retries}' #- '{options,reason}' #- '{options,traceback}' #- '{options,requeue_timestamp}'
+                        )
+                        on conflict (message_id) do update set
+                            retries = excluded.retries,
+                            reason = excluded.reason,
+                            traceback = excluded.traceback,
+                            failed_at = excluded.failed_at,
+                            message = excluded.message;
+                    delete from data.dramatiq_queue where message_id = new.message_id;
+                    return null;
+                end;
+            $$;
+            create or replace trigger dramatiq_dead_letter
+                after update of state on data.dramatiq_queue
+                for each row
+                when (new.state = 'rejected' and old.state <> 'rejected')
+                execute function data.dramatiq_dead_letter();
+            """
+        )
+    )
+
+    # Requeue the given dead messages, or all of them, putting their fields back into the messages.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.requeue_dead_letters(message_ids uuid[] default null) returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_dead_letter
+                        where requeue_dead_letters.message_ids is null
+                            or message_id = any(requeue_dead_letters.message_ids)
+                        returning message_id, user_id, queue_name, actor_name, message
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message)
+                        select
+                            d.user_id,
+                            d.message_id,
+                            d.queue_name,
+                            'queued',
+                            now(),
+                            d.message || jsonb_build_object('message_id', d.message_id, 'queue_name', d.queue_name, 'actor_name', d.actor_name)
+                        from dead d
+                        on conflict (message_id) do update set
+                            user_id = excluded.user_id,
+                            queue_name = excluded.queue_name,
+                            state = excluded.state,
+                            mtime = excluded.mtime,
+                            message = excluded.message,
+                            result = null,
+                            result_ttl = null
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$;
+            """
+        )
+    )
+
+    # Register or update the heartbeat of a worker. Once a worker is draining, it remains draining.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_heartbeat(worker_id text, hostname text, pid integer, ttl interval, draining boolean default false) returns void language sql as $$
+                insert into data.dramatiq_worker as w (worker_id, hostname, pid, heartbeat_at, expires_at, draining)
+                    values (
+                        dramatiq_heartbeat.worker_id,
+                        dramatiq_heartbeat.hostname,
+                        dramatiq_heartbeat.pid,
+                        now(),
+                        now() + dramatiq_heartbeat.ttl,
+                        dramatiq_heartbeat.draining
+                    )
+                    on conflict (worker_id) do update set
+                        heartbeat_at = excluded.heartbeat_at,
+                        expires_at = excluded.expires_at,
+                        draining = w.draining or excluded.draining
+            $$;
+            """
+        )
+    )
+
+    # Reclaim the messages of dead workers: a worker is dead if its heartbeat expired and none of its
+    # db connections are left. Its consumed messages are requeued, which notifies the listening workers.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_reclaim() returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_worker w
+                        where w.expires_at < now()
+                            and not exists (select from pg_stat_activity a where a.application_name = w.worker_id)
+                        returning w.worker_id
+                )
+                update data.dramatiq_queue q
+                    set state = 'queued'
+                    from dead d
+                    where q.worker_id = d.worker_id and q.state = 'consumed'
+                    returning q.message_id
+            $$;
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
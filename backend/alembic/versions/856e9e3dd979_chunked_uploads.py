@@ -0,0 +1,250 @@
+"""Chunked file uploads and their processing
+
+Revision ID: 856e9e3dd979
+Revises: b25ffb245556
+Create Date: 2026-10-19 14:22:36.871604+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "856e9e3dd979"
+down_revision: Union[str, None] = "b25ffb245556"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # Private function to create & send a message to the async Dramatiq workers, used by all API
+    # functions which enqueue jobs. Returns the id of the new message.
+    op.execute(
+        sa.text(
+            """
+            create function data.enqueue(
+                user_id bigint,
+                queue_name text,
+                actor_name text,
+                args jsonb default jsonb_build_array(),
+                kwargs jsonb default jsonb_build_object(),
+                options jsonb default jsonb_build_object()
+            ) returns uuid language sql as $$
+                with message as (
+                    select
+                        enqueue.queue_name as queue_name,  -- Dramatiq message queue name.
+                        enqueue.actor_name as actor_name,  -- Dramatiq actor function.
+                        enqueue.args as args,  -- Positional args for function.
+                        enqueue.kwargs as kwargs,  -- Keyword args for function.
+                        enqueue.options as options,  -- Additional Dramatiq broker options.
+                        gen_random_uuid() as message_id,
+                        extract(epoch from now())::bigint as message_timestamp
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message)
+                        select
+                            enqueue.user_id,
+                            m.message_id,
+                            m.queue_name,
+                            'queued',
+                            to_timestamp(m.message_timestamp),
+                            to_jsonb(m)
+                        from message m
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$
+            """
+        )
+    )
+
+    op.execute(sa.text("grant execute on function data.enqueue to apiuser, dramatiq"))
+
+    # Public API function to create & send a message to the async Dramatiq workers.
+    op.execute(
+        sa.text(
+            """
+            create or replace function api.job() returns record language sql as $$
+                select data.enqueue(u.id, 'job_q', 'job') as job_id
+                    from auth.user u
+                    where u.email = current_setting('request.jwt.claims', true)::json->>'email'
+            $$
+            """
+        )
+    )
+
+    # The `upload` table contains one row for every uploaded file, and the `upload_chunk` table
+    # contains the file's content in chunks. Files are uploaded chunk by chunk (see `api.upload_chunk`
+    # below) which keeps requests small and lets workers stream the content. The MIME type of the
+    # file is sniffed from its first chunk. Chunks are stored uncompressed: most uploaded files are
+    # compressed already, and uncompressed chunks are faster to read.
+    op.execute(
+        sa.text(
+            """
+            create table data.upload(
+                id uuid primary key default gen_random_uuid(),
+                user_id bigint not null references auth.user(id),
+                created_at timestamp with time zone default now(),
+                filename text,
+                mime_type text,
+                size bigint not null default 0,
+                chunks integer not null default 0,
+                state text not null default 'uploading' check (state in ('uploading', 'processing', 'done')),
+                sha256 text,
+                job_id uuid
+            );
+            create table data.upload_chunk(
+                upload_id uuid references data.upload(id) on delete cascade,
+                seq integer check (seq >= 0),
+                data bytea not null,
+                primary key (upload_id, seq)
+            );
+            alter table data.upload_chunk alter column data set storage external;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            grant select, insert, update(mime_type, size, chunks, state, job_id) on data.upload to apiuser;
+            grant select, insert on data.upload_chunk to apiuser;
+            grant select, update(size, state, sha256) on data.upload to dramatiq;
+            grant select on data.upload_chunk to dramatiq;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            alter table data.upload enable row level security;
+            create policy user_upload_policy on data.upload to apiuser, dramatiq
+                using (
+                    current_role = 'dramatiq'
+                    or user_id = (
+                        select id
+                            from auth.user
+                            where email = (select current_setting('request.jwt.claims', true)::json->>'email')
+                    )
+                );
+            alter table data.upload_chunk enable row level security;
+            create policy user_upload_chunk_policy on data.upload_chunk to apiuser, dramatiq
+                using (
+                    current_role = 'dramatiq'
+                    or exists (select from data.upload u where u.id = upload_chunk.upload_id)
+                );
+            """
+        )
+    )
+
+    # The public `upload` view presents the uploads of an auth'ed user.
+    op.execute(
+        sa.text(
+            """
+            create view api.upload with (security_invoker = true) as
+                select id as upload_id, filename, mime_type, size, state, sha256, job_id, created_at from data.upload
+            """
+        )
+    )
+
+    op.execute(sa.text("grant select on api.upload to apiuser"))
+
+    # Public API function to start a new upload.
+    op.execute(
+        sa.text(
+            """
+            create function api.upload_start(filename text default null) returns record language sql as $$
+                insert into data.upload (user_id, filename)
+                    select id, upload_start.filename
+                        from auth.user
+                        where email = current_setting('request.jwt.claims', true)::json->>'email'
+                    returning id as upload_id
+            $$
+            """
+        )
+    )
+
+    # Public API function to upload a single chunk of a file. The chunk is the raw request body
+    # (`Content-Type: application/octet-stream`) and the upload id and zero-based sequence number
+    # of the chunk are passed as the `Upload-Id` and `Upload-Chunk` request headers. The MIME type
+    # of the uploaded file is sniffed once, from its first chunk.
+    # See also: https://docs.postgrest.org/en/stable/references/api/functions.html#function-with-single-unnamed-parameter
+    op.execute(
+        sa.text(
+            """
+            create function api.upload_chunk(bytea) returns record language plpgsql as $$
+                declare
+                    headers json := current_setting('request.headers', true)::json;
+                    upload_id_ uuid := headers->>'upload-id';
+                    seq_ integer := coalesce(headers->>'upload-chunk', '0')::integer;
+                    ret record;
+                begin
+                    if octet_length($1) > 1024 * 1024 then
+                        raise sqlstate 'PT413' using message = 'upload chunk exceeds 1 MiB';
+                    end if;
+                    update data.upload u
+                        set size = u.size + octet_length($1),
+                            chunks = u.chunks + 1,
+                            mime_type = case when seq_ = 0 then byteamagic_mime($1) else u.mime_type end
+                        where u.id = upload_id_ and u.state = 'uploading'
+                        returning u.id as upload_id, u.size, u.chunks into ret;
+                    if not found then
+                        raise no_data_found using message = 'unknown upload';
+                    end if;
+                    insert into data.upload_chunk (upload_id, seq, data) values (upload_id_, seq_, $1);
+                    return ret;
+                end;
+            $$
+            """
+        )
+    )
+
+    # Public API function to finish an upload: checks that all chunks arrived and enqueues the
+    # job that processes the uploaded file.
+    op.execute(
+        sa.text(
+            """
+            create function api.upload_finish(upload_id uuid) returns record language plpgsql as $$
+                declare
+                    user_id_ bigint;
+                    ret record;
+                begin
+                    update data.upload u
+                        set state = 'processing'
+                        where u.id = upload_finish.upload_id
+                            and u.state = 'uploading'
+                            and u.chunks > 0
+                            and u.chunks = (select max(c.seq) + 1 from data.upload_chunk c where c.upload_id = u.id)
+                        returning u.user_id into user_id_;
+                    if not found then
+                        raise no_data_found using message = 'unknown or incomplete upload';
+                    end if;
+                    update data.upload u
+                        set job_id = data.enqueue(user_id_, 'upload_q', 'process_upload', jsonb_build_array(upload_finish.upload_id))
+                        where u.id = upload_finish.upload_id
+                        returning u.job_id into ret;
+                    return ret;
+                end;
+            $$
+            """
+        )
+    )
+
+    op.execute(sa.text("grant execute on function api.upload_start, api.upload_chunk, api.upload_finish to apiuser"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,157 @@
+"""Trace messages from the enqueueing request to the actor
+
+Revision ID: a24c8f6742e4
+Revises: df73f69eaad5
+Create Date: 2026-10-19 17:31:48.662019+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a24c8f6742e4"
+down_revision: Union[str, None] = "df73f69eaad5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # Every enqueued message carries a `trace` object in its options, see `template_jobs.tracing.Tracing`.
+    # The trace id and parent span id come from the W3C `traceparent` of the `app.traceparent` setting
+    # (set by workers which enqueue follow-up messages), or of the PostgREST request's `traceparent`
+    # header; otherwise a new trace begins. Times are in milliseconds since the epoch: `request_at` is
+    # the start of the request's transaction and `enqueued_at` the time the message was enqueued.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.enqueue(
+                user_id bigint,
+                queue_name text,
+                actor_name text,
+                args jsonb default jsonb_build_array(),
+                kwargs jsonb default jsonb_build_object(),
+                options jsonb default jsonb_build_object(),
+                workflow_id uuid default null
+            ) returns uuid language sql as $$
+                with traceparent as (
+                    select string_to_array(
+                        coalesce(
+                            nullif(current_setting('app.traceparent', true), ''),
+                            nullif(current_setting('request.headers', true), '')::json->>'traceparent',
+                            ''
+                        ),
+                        '-'
+                    ) as parts
+                ),
+                message as (
+                    select
+                        enqueue.queue_name as queue_name,  -- Dramatiq message queue name.
+                        enqueue.actor_name as actor_name,  -- Dramatiq actor function.
+                        enqueue.args as args,  -- Positional args for function.
+                        enqueue.kwargs as kwargs,  -- Keyword args for function.
+                        enqueue.options || jsonb_build_object(
+                            'trace', jsonb_strip_nulls(jsonb_build_object(
+                                'trace_id', coalesce(nullif(t.parts[2], ''), replace(gen_random_uuid()::text, '-', '')),
+                                'parent_span_id', nullif(t.parts[3], ''),
+                                'request_at', extract(epoch from now()) * 1000,
+                                'enqueued_at', extract(epoch from clock_timestamp()) * 1000
+                            ))
+                        ) as options,  -- Additional Dramatiq broker options.
+                        gen_random_uuid() as message_id,
+                        extract(epoch from now())::bigint as message_timestamp
+                        from traceparent t
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, workflow_id, message_id, queue_name, state, mtime, message)
+                        select
+                            enqueue.user_id,
+                            enqueue.workflow_id,
+                            m.message_id,
+                            m.queue_name,
+                            'queued',
+                            to_timestamp(m.message_timestamp),
+                            to_jsonb(m)
+                        from message m
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$
+            """
+        )
+    )
+
+    # The next step of a pipeline and the callback of a group continue the trace of the message which
+    # finished, and become children of that message's actor span (which the worker stored in the message).
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_workflow() returns trigger language plpgsql as $$
+                declare
+                    w data.workflow;
+                    results jsonb;
+                begin
+                    if new.state = 'rejected' then
+                        update data.workflow
+                            set state = 'failed', finished_at = now()
+                            where id = new.workflow_id and state = 'running';
+                        return null;
+                    end if;
+                    update data.workflow
+                        set pending = pending - 1
+                        where id = new.workflow_id and state = 'running'
+                        returning * into w;
+                    if not found then
+                        return null;
+                    end if;
+                    perform set_config(
+                        'app.traceparent',
+                        coalesce(
+                            '00-' || (new.message->'options'->'trace'->>'trace_id') || '-' || (new.message->'options'->'trace'->>'span_id') || '-01',
+                            ''
+                        ),
+                        true
+                    );
+                    if w.kind = 'group' and (w.pending = 0 and w.callback is null or w.pending = 1 and w.callback is not null) then
+                        select jsonb_agg(q.result order by array_position(w.job_ids, q.message_id))
+                            from data.dramatiq_queue q
+                            where q.message_id = any(w.job_ids)
+                            into results;
+                    end if;
+                    if w.pending = 0 then
+                        update data.workflow
+                            set state = 'done', result = coalesce(results, new.result), finished_at = now()
+                            where id = w.id;
+                    elsif w.kind = 'pipeline' then
+                        update data.workflow
+                            set steps = steps - 0,
+                                job_ids = job_ids || data.enqueue_step(w.user_id, w.id, w.steps->0, new.result)
+                            where id = w.id;
+                    elsif w.pending = 1 and w.callback is not null then
+                        update data.workflow
+                            set job_ids = job_ids || data.enqueue_step(w.user_id, w.id, w.callback, results)
+                            where id = w.id;
+                    end if;
+                    perform set_config('app.traceparent', '', true);
+                    return null;
+                end;
+            $$
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
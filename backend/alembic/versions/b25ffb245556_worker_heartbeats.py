@@ -0,0 +1,153 @@
+"""Worker heartbeats and reclaim of stale messages
+
+Revision ID: b25ffb245556
+Revises: 0acab19dc362
+Create Date: 2026-10-19 11:47:05.302917+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b25ffb245556"
+down_revision: Union[str, None] = "0acab19dc362"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # The `dramatiq_worker` table contains one row for every running Dramatiq worker process. Workers
+    # update their row periodically (their heartbeat) which extends the row's expiry; a draining worker
+    # extends its expiry for the duration of its drain timeout. The worker's id is also the application
+    # name of all the worker's db connections, see `template_jobs.heartbeat.Heartbeat`.
+    op.execute(
+        sa.text(
+            """
+            create table data.dramatiq_worker(
+                worker_id text primary key,
+                hostname text not null,
+                pid integer not null,
+                started_at timestamp with time zone not null default now(),
+                heartbeat_at timestamp with time zone not null default now(),
+                expires_at timestamp with time zone not null,
+                draining boolean not null default false
+            )
+            """
+        )
+    )
+
+    op.execute(sa.text("grant all privileges on table data.dramatiq_worker to dramatiq"))
+
+    # Every consumed message is tagged with the worker that consumed it. There's no foreign key to
+    # the `dramatiq_worker` table because rows of dead workers are deleted when they're reclaimed.
+    op.execute(
+        sa.text(
+            """
+            alter table data.dramatiq_queue add column worker_id text;
+            create index dramatiq_queue_worker_id_idx on data.dramatiq_queue (worker_id) where state = 'consumed';
+            """
+        )
+    )
+
+    # When a message is consumed, tag it with the consuming worker. When a consumed message goes back
+    # into the queue (i.e. Dramatiq-PG requeues prefetched messages on worker shutdown, or the message
+    # was reclaimed from a dead worker) notify listening workers, which Dramatiq-PG itself doesn't do.
+    # Without that notification the message would wait for the next poll of the queue table.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_queue_state() returns trigger language plpgsql as $$
+                begin
+                    if new.state = 'consumed' then
+                        new.worker_id = current_setting('application_name');
+                    elsif new.state = 'queued' and old.state = 'consumed' then
+                        new.worker_id = null;
+                        perform pg_notify(
+                            'dramatiq.' || new.queue_name || '.enqueue',
+                            jsonb_build_object('message_id', new.message_id)::text
+                        );
+                    end if;
+                    return new;
+                end;
+            $$
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create trigger dramatiq_queue_state
+                before update of state on data.dramatiq_queue
+                for each row
+                execute function data.dramatiq_queue_state();
+            """
+        )
+    )
+
+    # Register or update the heartbeat of a worker. Once a worker is draining, it remains draining.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_heartbeat(worker_id text, hostname text, pid integer, ttl interval, draining boolean default false) returns void language sql as $$
+                insert into data.dramatiq_worker as w (worker_id, hostname, pid, heartbeat_at, expires_at, draining)
+                    values (
+                        dramatiq_heartbeat.worker_id,
+                        dramatiq_heartbeat.hostname,
+                        dramatiq_heartbeat.pid,
+                        now(),
+                        now() + dramatiq_heartbeat.ttl,
+                        dramatiq_heartbeat.draining
+                    )
+                    on conflict (worker_id) do update set
+                        heartbeat_at = excluded.heartbeat_at,
+                        expires_at = excluded.expires_at,
+                        draining = w.draining or excluded.draining
+            $$
+            """
+        )
+    )
+
+    # Reclaim the messages of dead workers: a worker is dead if its heartbeat expired and none of its
+    # db connections are left (and therewith none of the advisory locks Dramatiq-PG holds for consumed
+    # messages). Its consumed messages are requeued, which notifies the listening workers (see above).
+    # Concurrent reclaims are safe because each dead worker's row can be deleted only once.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_reclaim() returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_worker w
+                        where w.expires_at < now()
+                            and not exists (select from pg_stat_activity a where a.application_name = w.worker_id)
+                        returning w.worker_id
+                )
+                update data.dramatiq_queue q
+                    set state = 'queued'
+                    from dead d
+                    where q.worker_id = d.worker_id and q.state = 'consumed'
+                    returning q.message_id
+            $$
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            grant execute on function data.dramatiq_heartbeat to dramatiq;
+            grant execute on function data.dramatiq_reclaim to dramatiq;
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,41 @@
+"""Failed uploads
+
+Revision ID: c4e2b7a9d013
+Revises: f0088f17d7a8
+Create Date: 2026-10-19 23:05:41.270833+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e2b7a9d013"
+down_revision: Union[str, None] = "f0088f17d7a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # An upload whose processing job failed is `failed` instead of remaining `processing`. A retry of
+    # the job, or requeueing it from the dead-letter table, processes the upload again and it's `done`
+    # once that succeeded.
+    op.execute(
+        sa.text(
+            """
+            alter table data.upload
+                drop constraint upload_state_check,
+                add constraint upload_state_check check (state in ('uploading', 'processing', 'failed', 'done'))
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,330 @@
+"""Job workflows: pipelines and groups
+
+Revision ID: df73f69eaad5
+Revises: 856e9e3dd979
+Create Date: 2026-10-19 16:05:12.094318+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "df73f69eaad5"
+down_revision: Union[str, None] = "856e9e3dd979"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # The `dramatiq_actor` table lists the actors which users may run through the public API,
+    # and the message queue of each actor.
+    op.execute(
+        sa.text(
+            """
+            create table data.dramatiq_actor(
+                actor_name text primary key,
+                queue_name text not null
+            );
+            insert into data.dramatiq_actor (actor_name, queue_name) values ('job', 'job_q');
+            grant select on data.dramatiq_actor to apiuser, dramatiq;
+            """
+        )
+    )
+
+    # The `workflow` table tracks multi-step jobs. A `pipeline` runs its steps one after the other
+    # and passes the result of each step as the last positional argument to the next step (unless
+    # the next step's `pipe_ignore` option is set). A `group` runs its steps concurrently and, once
+    # all of them are done, runs its optional callback with the list of the steps' results. The
+    # `pending` counter holds the number of messages which have yet to finish, and `job_ids` the
+    # ids of all messages enqueued so far in order of the steps.
+    op.execute(
+        sa.text(
+            """
+            create table data.workflow(
+                id uuid primary key default gen_random_uuid(),
+                user_id bigint references auth.user(id),
+                kind text not null check (kind in ('pipeline', 'group')),
+                state text not null default 'running' check (state in ('running', 'done', 'failed')),
+                pending integer not null check (pending >= 0),
+                steps jsonb not null default jsonb_build_array(),  -- Pipeline steps yet to be enqueued.
+                callback jsonb,  -- Group callback.
+                job_ids uuid[] not null default '{}',
+                result jsonb,
+                created_at timestamp with time zone default now(),
+                finished_at timestamp with time zone
+            );
+            alter table data.dramatiq_queue add column workflow_id uuid references data.workflow(id) on delete set null;
+            create index dramatiq_queue_workflow_id_idx on data.dramatiq_queue (workflow_id) where workflow_id is not null;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            grant select, insert, update(job_ids) on data.workflow to apiuser;
+            grant select, insert, update on data.workflow to dramatiq;
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            alter table data.workflow enable row level security;
+            create policy user_workflow_policy on data.workflow to apiuser, dramatiq
+                using (
+                    current_role = 'dramatiq'
+                    or user_id = (
+                        select id
+                            from auth.user
+                            where email = (select current_setting('request.jwt.claims', true)::json->>'email')
+                    )
+                );
+            """
+        )
+    )
+
+    # Messages can now belong to a workflow, so recreate the private enqueue function with that
+    # additional argument.
+    op.execute(
+        sa.text(
+            """
+            drop function data.enqueue(bigint, text, text, jsonb, jsonb, jsonb);
+            create function data.enqueue(
+                user_id bigint,
+                queue_name text,
+                actor_name text,
+                args jsonb default jsonb_build_array(),
+                kwargs jsonb default jsonb_build_object(),
+                options jsonb default jsonb_build_object(),
+                workflow_id uuid default null
+            ) returns uuid language sql as $$
+                with message as (
+                    select
+                        enqueue.queue_name as queue_name,  -- Dramatiq message queue name.
+                        enqueue.actor_name as actor_name,  -- Dramatiq actor function.
+                        enqueue.args as args,  -- Positional args for function.
+                        enqueue.kwargs as kwargs,  -- Keyword args for function.
+                        enqueue.options as options,  -- Additional Dramatiq broker options.
+                        gen_random_uuid() as message_id,
+                        extract(epoch from now())::bigint as message_timestamp
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, workflow_id, message_id, queue_name, state, mtime, message)
+                        select
+                            enqueue.user_id,
+                            enqueue.workflow_id,
+                            m.message_id,
+                            m.queue_name,
+                            'queued',
+                            to_timestamp(m.message_timestamp),
+                            to_jsonb(m)
+                        from message m
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$;
+            grant execute on function data.enqueue to apiuser, dramatiq;
+            """
+        )
+    )
+
+    # Enqueue a single workflow step, i.e. a json object with the `queue_name`, `actor_name` and
+    # optional `args`, `kwargs` and `options` of the message. The given result is appended to the
+    # positional arguments unless the step's `pipe_ignore` option is set.
+    op.execute(
+        sa.text(
+            """
+            create function data.enqueue_step(user_id bigint, workflow_id uuid, step jsonb, result jsonb default null) returns uuid language sql as $$
+                select data.enqueue(
+                    enqueue_step.user_id,
+                    enqueue_step.step->>'queue_name',
+                    enqueue_step.step->>'actor_name',
+                    case
+                        when enqueue_step.result is null or (enqueue_step.step->'options'->>'pipe_ignore')::boolean
+                        then coalesce(enqueue_step.step->'args', jsonb_build_array())
+                        else coalesce(enqueue_step.step->'args', jsonb_build_array()) || jsonb_build_array(enqueue_step.result)
+                    end,
+                    coalesce(enqueue_step.step->'kwargs', jsonb_build_object()),
+                    coalesce(enqueue_step.step->'options', jsonb_build_object()),
+                    enqueue_step.workflow_id
+                )
+            $$;
+            grant execute on function data.enqueue_step to apiuser, dramatiq;
+            """
+        )
+    )
+
+    # Create a new workflow and enqueue its first step(s); returns the workflow's id. A pipeline's
+    # callback is simply its last step.
+    op.execute(
+        sa.text(
+            """
+            create function data.create_workflow(user_id bigint, kind text, steps jsonb, callback jsonb default null) returns uuid language plpgsql as $$
+                declare
+                    workflow_id_ uuid := gen_random_uuid();
+                    job_ids_ uuid[];
+                begin
+                    if jsonb_typeof(steps) is distinct from 'array' or jsonb_array_length(steps) = 0 then
+                        raise invalid_parameter_value using message = 'workflow requires an array of steps';
+                    end if;
+                    if kind = 'pipeline' then
+                        if callback is not null then
+                            steps := steps || jsonb_build_array(callback);
+                        end if;
+                        insert into data.workflow (id, user_id, kind, pending, steps)
+                            values (workflow_id_, create_workflow.user_id, kind, jsonb_array_length(steps), steps - 0);
+                        job_ids_ := array[data.enqueue_step(create_workflow.user_id, workflow_id_, steps->0)];
+                    elsif kind = 'group' then
+                        insert into data.workflow (id, user_id, kind, pending, callback)
+                            values (workflow_id_, create_workflow.user_id, kind, jsonb_array_length(steps) + (callback is not null)::integer, callback);
+                        select array_agg(data.enqueue_step(create_workflow.user_id, workflow_id_, s.step) order by s.ord)
+                            from jsonb_array_elements(steps) with ordinality as s(step, ord)
+                            into job_ids_;
+                    else
+                        raise invalid_parameter_value using message = 'unknown workflow kind';
+                    end if;
+                    update data.workflow set job_ids = job_ids_ where id = workflow_id_;
+                    return workflow_id_;
+                end;
+            $$;
+            grant execute on function data.create_workflow to apiuser, dramatiq;
+            """
+        )
+    )
+
+    # Advance a workflow when one of its messages finished. Dramatiq-PG acks a message by updating its
+    # state from `consumed` to `done` exactly once, and the workflow row is locked while its `pending`
+    # counter is decremented. Therefore the next pipeline step and the group callback are enqueued
+    # exactly once, and only by the last finishing message. A failed message fails its workflow.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_workflow() returns trigger language plpgsql as $$
+                declare
+                    w data.workflow;
+                    results jsonb;
+                begin
+                    if new.state = 'rejected' then
+                        update data.workflow
+                            set state = 'failed', finished_at = now()
+                            where id = new.workflow_id and state = 'running';
+                        return null;
+                    end if;
+                    update data.workflow
+                        set pending = pending - 1
+                        where id = new.workflow_id and state = 'running'
+                        returning * into w;
+                    if not found then
+                        return null;
+                    end if;
+                    if w.kind = 'group' and (w.pending = 0 and w.callback is null or w.pending = 1 and w.callback is not null) then
+                        select jsonb_agg(q.result order by array_position(w.job_ids, q.message_id))
+                            from data.dramatiq_queue q
+                            where q.message_id = any(w.job_ids)
+                            into results;
+                    end if;
+                    if w.pending = 0 then
+                        update data.workflow
+                            set state = 'done', result = coalesce(results, new.result), finished_at = now()
+                            where id = w.id;
+                    elsif w.kind = 'pipeline' then
+                        update data.workflow
+                            set steps = steps - 0,
+                                job_ids = job_ids || data.enqueue_step(w.user_id, w.id, w.steps->0, new.result)
+                            where id = w.id;
+                    elsif w.pending = 1 and w.callback is not null then
+                        update data.workflow
+                            set job_ids = job_ids || data.enqueue_step(w.user_id, w.id, w.callback, results)
+                            where id = w.id;
+                    end if;
+                    return null;
+                end;
+            $$
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create trigger dramatiq_workflow
+                after update of state on data.dramatiq_queue
+                for each row
+                when (new.workflow_id is not null and new.state in ('done', 'rejected') and old.state <> new.state)
+                execute function data.dramatiq_workflow();
+            """
+        )
+    )
+
+    # The public `workflow` view presents the workflows of an auth'ed user. Clients poll a single
+    # workflow instead of all of its jobs.
+    op.execute(
+        sa.text(
+            """
+            create view api.workflow with (security_invoker = true) as
+                select id as workflow_id, kind, state, pending, job_ids, result, created_at, finished_at from data.workflow
+            """
+        )
+    )
+
+    op.execute(sa.text("grant select on api.workflow to apiuser"))
+
+    # Public API function to start a workflow. Steps and callback are json objects with an `actor_name`
+    # and optional `args`, `kwargs` and `options`; only actors listed in `data.dramatiq_actor` may run.
+    op.execute(
+        sa.text(
+            """
+            create function api.workflow(kind text, steps jsonb, callback jsonb default null) returns record language plpgsql as $$
+                declare
+                    user_id_ bigint;
+                    steps_ jsonb;
+                    callback_ jsonb;
+                    ret record;
+                begin
+                    select id from auth.user where email = current_setting('request.jwt.claims', true)::json->>'email' into user_id_;
+                    if jsonb_typeof(steps) is distinct from 'array' then
+                        raise invalid_parameter_value using message = 'workflow requires an array of steps';
+                    end if;
+                    select jsonb_agg(s.step || jsonb_build_object('queue_name', a.queue_name) order by s.ord)
+                        from jsonb_array_elements(steps) with ordinality as s(step, ord)
+                        join data.dramatiq_actor a on a.actor_name = s.step->>'actor_name'
+                        into steps_;
+                    if coalesce(jsonb_array_length(steps_), 0) <> jsonb_array_length(steps) then
+                        raise invalid_parameter_value using message = 'unknown actor';
+                    end if;
+                    if callback is not null then
+                        select callback || jsonb_build_object('queue_name', a.queue_name)
+                            from data.dramatiq_actor a
+                            where a.actor_name = callback->>'actor_name'
+                            into callback_;
+                        if not found then
+                            raise invalid_parameter_value using message = 'unknown actor';
+                        end if;
+                    end if;
+                    select data.create_workflow(user_id_, kind, steps_, callback_) as workflow_id into ret;
+                    return ret;
+                end;
+            $$;
+            grant execute on function api.workflow to apiuser;
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
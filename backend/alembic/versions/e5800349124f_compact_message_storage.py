@@ -0,0 +1,160 @@
+"""Compact and compressed storage of messages and results
+
+Revision ID: e5800349124f
+Revises: a24c8f6742e4
+Create Date: 2026-10-19 18:52:20.417735+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5800349124f"
+down_revision: Union[str, None] = "a24c8f6742e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # Compress messages and results with lz4, which is much faster than Postgres' default pglz. By
+    # default Postgres compresses a row only if it exceeds ~2kB, and then moves large values out of
+    # line into the TOAST table, which costs an extra index lookup for every read. With the lower
+    # `toast_tuple_target` and `main` storage, rows larger than 256 bytes are compressed but remain
+    # inline unless they don't fit into a page. Existing rows are compressed when they're updated.
+    # Note that the `queue_name` and `message_id` fields of the message can't be stripped although
+    # they're columns too: Dramatiq-PG reads the message as a whole and decodes it into a message.
+    # See also: https://www.postgresql.org/docs/current/storage-toast.html
+    op.execute(
+        sa.text(
+            """
+            alter table data.dramatiq_queue
+                alter column message set compression lz4,
+                alter column message set storage main,
+                alter column result set compression lz4,
+                alter column result set storage main,
+                set (toast_tuple_target = 256);
+            alter table data.dramatiq_dead_letter
+                alter column message set compression lz4,
+                alter column traceback set compression lz4;
+            """
+        )
+    )
+
+    # The Retries middleware adds the traceback of the failed attempt to the options of a message that
+    # is going to be retried. Only the traceback of the last attempt matters (the dead-letter table
+    # records it, see below) and Dramatiq-PG writes it when it nacks the message, so strip tracebacks
+    # from requeued messages. They'd be the largest part of the message otherwise.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_queue_compact() returns trigger language plpgsql as $$
+                begin
+                    new.message = new.message #- '{options,traceback}';
+                    return new;
+                end;
+            $$
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create trigger dramatiq_queue_compact
+                before insert or update of message on data.dramatiq_queue
+                for each row
+                when (new.state = 'queued' and new.message->'options' ? 'traceback')
+                execute function data.dramatiq_queue_compact();
+            """
+        )
+    )
+
+    # Dead messages are stored without the fields that are columns of the dead-letter table anyway,
+    # and requeueing a dead message puts these fields back into the message.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter() returns trigger language plpgsql as $$
+                begin
+                    insert into data.dramatiq_dead_letter as d
+                        (message_id, user_id, queue_name, actor_name, retries, reason, traceback, message)
+                        values (
+                            new.message_id,
+                            new.user_id,
+                            new.queue_name,
+                            new.message->>'actor_name',
+                            coalesce((new.message->'options'->>'retries')::integer, 0),
+                            new.message->'options'->>'reason',
+                            new.message->'options'->>'traceback',
+                            new.message - '{message_id, queue_name, actor_name}'::text[]
+                                #- '{options,retries}' #- '{options,reason}' #- '{options,traceback}' #- '{options,requeue_timestamp}'
+                        )
+                        on conflict (message_id) do update set
+                            retries = excluded.retries,
+                            reason = excluded.reason,
+                            traceback = excluded.traceback,
+                            failed_at = excluded.failed_at,
+                            message = excluded.message;
+                    delete from data.dramatiq_queue where message_id = new.message_id;
+                    return null;
+                end;
+            $$;
+            update data.dramatiq_dead_letter
+                set message = message - '{message_id, queue_name, actor_name}'::text[]
+                    #- '{options,retries}' #- '{options,reason}' #- '{options,traceback}' #- '{options,requeue_timestamp}';
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.requeue_dead_letters(message_ids uuid[] default null) returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_dead_letter
+                        where requeue_dead_letters.message_ids is null
+                            or message_id = any(requeue_dead_letters.message_ids)
+                        returning message_id, user_id, queue_name, actor_name, message
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message)
+                        select
+                            d.user_id,
+                            d.message_id,
+                            d.queue_name,
+                            'queued',
+                            now(),
+                            d.message || jsonb_build_object('message_id', d.message_id, 'queue_name', d.queue_name, 'actor_name', d.actor_name)
+                        from dead d
+                        on conflict (message_id) do update set
+                            user_id = excluded.user_id,
+                            queue_name = excluded.queue_name,
+                            state = excluded.state,
+                            mtime = excluded.mtime,
+                            message = excluded.message,
+                            result = null,
+                            result_ttl = null
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
@@ -0,0 +1,308 @@
+"""Keep the results and workflows of dead messages
+
+Revision ID: f0088f17d7a8
+Revises: 6bb974307c1f
+Create Date: 2026-10-19 22:31:52.407915+00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f0088f17d7a8"
+down_revision: Union[str, None] = "6bb974307c1f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # Dead messages keep the exception which the Results middleware stores for them, and the workflow
+    # which they're a step of. Dead messages of workflows have lost their workflow so far, which their
+    # workflow's `job_ids` still records.
+    op.execute(
+        sa.text(
+            """
+            alter table data.dramatiq_dead_letter
+                add column result jsonb compression lz4,
+                add column workflow_id uuid references data.workflow(id) on delete set null;
+            update data.dramatiq_dead_letter d
+                set workflow_id = w.id
+                from data.workflow w
+                where d.message_id = any(w.job_ids);
+            """
+        )
+    )
+
+    # Store the exception of a rejected message with the dead message (see `dramatiq_dead_letter_result`
+    # below), and remove the result rows which were left in the queue table for dead messages so far.
+    op.execute(
+        sa.text(
+            """
+            update data.dramatiq_dead_letter d
+                set result = q.result
+                from data.dramatiq_queue q
+                where q.message_id = d.message_id and q.queue_name = '__RQ__';
+            delete from data.dramatiq_queue q
+                using data.dramatiq_dead_letter d
+                where q.message_id = d.message_id and q.queue_name = '__RQ__';
+            """
+        )
+    )
+
+    # Move rejected messages into the dead-letter table, without the fields that are columns of the
+    # dead-letter table anyway. The message keeps its workflow, such that requeueing it continues the
+    # workflow.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter() returns trigger language plpgsql as $$
+                begin
+                    insert into data.dramatiq_dead_letter as d
+                        (message_id, user_id, workflow_id, queue_name, actor_name, retries, reason, traceback, message)
+                        values (
+                            new.message_id,
+                            new.user_id,
+                            new.workflow_id,
+                            new.queue_name,
+                            new.message->>'actor_name',
+                            coalesce((new.message->'options'->>'retries')::integer, 0),
+                            new.message->'options'->>'reason',
+                            new.message->'options'->>'traceback',
+                            new.message - '{message_id, queue_name, actor_name}'::text[]
+                                #- '{options,retries}' #- '{options,reason}' #- '{options,traceback}' #- '{options,requeue_timestamp}'
+                        )
+                        on conflict (message_id) do update set
+                            workflow_id = excluded.workflow_id,
+                            retries = excluded.retries,
+                            reason = excluded.reason,
+                            traceback = excluded.traceback,
+                            failed_at = excluded.failed_at,
+                            message = excluded.message;
+                    delete from data.dramatiq_queue where message_id = new.message_id;
+                    return null;
+                end;
+            $$;
+            create or replace trigger dramatiq_dead_letter
+                after update of state on data.dramatiq_queue
+                for each row
+                when (new.state = 'rejected' and old.state <> 'rejected')
+                execute function data.dramatiq_dead_letter();
+            """
+        )
+    )
+
+    # The Results middleware stores the exception of a rejected message after the message was moved
+    # into the dead-letter table. Dramatiq-PG then inserts a new row, without user or workflow, into
+    # the queue table for the result; keep the result with the dead message instead.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_dead_letter_result() returns trigger language plpgsql as $$
+                begin
+                    update data.dramatiq_dead_letter set result = new.result where message_id = new.message_id;
+                    if found then
+                        delete from data.dramatiq_queue where message_id = new.message_id;
+                    end if;
+                    return null;
+                end;
+            $$;
+            create or replace trigger dramatiq_dead_letter_result
+                after insert on data.dramatiq_queue
+                for each row
+                when (new.queue_name = '__RQ__')
+                execute function data.dramatiq_dead_letter_result();
+            """
+        )
+    )
+
+    # Requeue the given dead messages, or all of them, putting their fields back into the messages.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.requeue_dead_letters(message_ids uuid[] default null) returns setof uuid language sql as $$
+                with dead as (
+                    delete from data.dramatiq_dead_letter
+                        where requeue_dead_letters.message_ids is null
+                            or message_id = any(requeue_dead_letters.message_ids)
+                        returning message_id, user_id, workflow_id, queue_name, actor_name, message
+                ),
+                enque as (
+                    insert into data.dramatiq_queue (user_id, workflow_id, message_id, queue_name, state, mtime, message)
+                        select
+                            d.user_id,
+                            d.workflow_id,
+                            d.message_id,
+                            d.queue_name,
+                            'queued',
+                            now(),
+                            d.message || jsonb_build_object('message_id', d.message_id, 'queue_name', d.queue_name, 'actor_name', d.actor_name)
+                        from dead d
+                        on conflict (message_id) do update set
+                            user_id = excluded.user_id,
+                            workflow_id = excluded.workflow_id,
+                            queue_name = excluded.queue_name,
+                            state = excluded.state,
+                            mtime = excluded.mtime,
+                            message = excluded.message,
+                            result = null,
+                            result_ttl = null
+                        returning queue_name, message_id
+                ),
+                notify as (
+                    select
+                        message_id,
+                        pg_notify('dramatiq.' || queue_name || '.enqueue', jsonb_build_object('message_id', message_id)::text)
+                        from enque
+                )
+                select message_id from notify
+            $$;
+            """
+        )
+    )
+
+    # The shards' foreign dead-letter tables were imported without the new columns.
+    op.execute(
+        sa.text(
+            """
+            do $$
+                declare
+                    shard_ text;
+                begin
+                    for shard_ in select distinct s.shard from data.queue_shard s loop
+                        execute format(
+                            'alter foreign table %I.dramatiq_dead_letter add column if not exists result jsonb, add column if not exists workflow_id uuid',
+                            shard_
+                        );
+                    end loop;
+                end;
+            $$
+            """
+        )
+    )
+
+    # Users see the exception of their dead jobs.
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.shard_jobs() returns table(job_id uuid, state text, result jsonb)
+                language plpgsql stable security definer set search_path = '' as $$
+                declare
+                    user_id_ bigint;
+                    shard_ text;
+                begin
+                    select id
+                        from auth.user
+                        where email = current_setting('request.jwt.claims', true)::json->>'email'
+                        into user_id_;
+                    if user_id_ is null then
+                        return;
+                    end if;
+                    for shard_ in select distinct s.shard from data.queue_shard s order by s.shard loop
+                        return query execute format(
+                            'select message_id, state, result from %1$I.dramatiq_queue where user_id = $1
+                                union all
+                                select message_id, ''rejected'', result from %1$I.dramatiq_dead_letter where user_id = $1',
+                            shard_
+                        ) using user_id_;
+                    end loop;
+                end;
+            $$;
+            create or replace view api.job with (security_invoker = true) as
+                select message_id as job_id, state, result from data.dramatiq_queue
+                union all
+                select message_id as job_id, 'rejected' as state, result from data.dramatiq_dead_letter
+                union all
+                select job_id, state, result from data.shard_jobs();
+            """
+        )
+    )
+
+    # A failed workflow continues when its dead message is requeued. Its other messages may finish while
+    # it has failed; they count as finished, but the workflow doesn't go on until it continues.
+    op.execute(
+        sa.text(
+            """
+            create function data.dramatiq_workflow_continue() returns trigger language plpgsql as $$
+                begin
+                    update data.workflow
+                        set state = 'running', finished_at = null
+                        where id = new.workflow_id and state = 'failed';
+                    return null;
+                end;
+            $$;
+            create trigger dramatiq_workflow_continue
+                after insert on data.dramatiq_queue
+                for each row
+                when (new.workflow_id is not null and new.state = 'queued')
+                execute function data.dramatiq_workflow_continue();
+            """
+        )
+    )
+
+    op.execute(
+        sa.text(
+            """
+            create or replace function data.dramatiq_workflow() returns trigger language plpgsql as $$
+                declare
+                    w data.workflow;
+                    results jsonb;
+                begin
+                    if new.state = 'rejected' then
+                        update data.workflow
+                            set state = 'failed', finished_at = now()
+                            where id = new.workflow_id and state = 'running';
+                        return null;
+                    end if;
+                    update data.workflow
+                        set pending = pending - 1
+                        where id = new.workflow_id and state in ('running', 'failed')
+                        returning * into w;
+                    if not found or w.state = 'failed' then
+                        return null;
+                    end if;
+                    perform set_config(
+                        'app.traceparent',
+                        coalesce(
+                            '00-' || (new.message->'options'->'trace'->>'trace_id') || '-' || (new.message->'options'->'trace'->>'span_id') || '-01',
+                            ''
+                        ),
+                        true
+                    );
+                    if w.kind = 'group' and (w.pending = 0 and w.callback is null or w.pending = 1 and w.callback is not null) then
+                        select jsonb_agg(q.result order by array_position(w.job_ids, q.message_id))
+                            from data.dramatiq_queue q
+                            where q.message_id = any(w.job_ids)
+                            into results;
+                    end if;
+                    if w.pending = 0 then
+                        update data.workflow
+                            set state = 'done', result = coalesce(results, new.result), finished_at = now()
+                            where id = w.id;
+                    elsif w.kind = 'pipeline' then
+                        update data.workflow
+                            set steps = steps - 0,
+                                job_ids = job_ids || data.enqueue_step(w.user_id, w.id, w.steps->0, new.result)
+                            where id = w.id;
+                    elsif w.pending = 1 and w.callback is not null then
+                        update data.workflow
+                            set job_ids = job_ids || data.enqueue_step(w.user_id, w.id, w.callback, results)
+                            where id = w.id;
+                    end if;
+                    perform set_config('app.traceparent', '', true);
+                    return null;
+                end;
+            $$
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    raise NotImplementedError("No down migrations beyond this version")
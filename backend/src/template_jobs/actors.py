@@ -5,12 +5,20 @@
 
 import dramatiq
 
+from .retries import RETRY_POLICIES
+
 # When this module run it initializes the Dramatiq actors below.
 # It therefore needs a broker to register the actors with.
 assert dramatiq.broker.global_broker is not None
 
 
-@dramatiq.actor(queue_name="job_q", store_results=True)
+@dramatiq.actor(
+    queue_name="job_q",
+    store_results=True,
+    max_retries=RETRY_POLICIES["job"].max_retries,
+    min_backoff=RETRY_POLICIES["job"].min_backoff,
+    max_backoff=RETRY_POLICIES["job"].max_backoff,
+)
 def job() -> str:
     """Do a job."""
     return "done"
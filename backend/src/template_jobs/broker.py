@@ -3,16 +3,81 @@
 # Copyright (c) 2025-2025
 # This code is licensed under MIT license, see LICENSE.md for details.
 
+import functools
+import importlib
 import os
+import urllib.parse
 
 import dramatiq
-import dramatiq_pg
+import dramatiq.common
+from dramatiq.middleware import CurrentMessage, Retries
 
-# Create the Postgres Broker instance that manages reading from and writing
-# to the message queue (which is implemented by PG).
-dramatiq.set_broker(
-    dramatiq_pg.PostgresBroker(url=os.environ["DRAMATIQ_SQLA_URL"], results=True, schema="data", prefix="dramatiq_")
-)
+# The modules that declare the actors for each message queue. A worker imports only
+# the modules for the queues it consumes from, see the `setup()` function below.
+ACTOR_MODULES = {
+    "job_q": "template_jobs.actors",
+    "upload_q": "template_jobs.uploads",
+}
 
-# Importing the actor module registers the Dramatiq actors with the broker.
-from . import actors  # noqa: F401,E402 # pylint: disable=unused-import,wrong-import-position
+
+@functools.cache
+def setup() -> dramatiq.Broker:
+    """Create the Dramatiq broker and register the actors with it.
+
+    Importing this module is cheap: the broker, its dependencies and the actors are
+    loaded only when this function is called, which the Dramatiq CLI does in every
+    worker process when given ``template_jobs.broker:setup`` as the broker. Only the
+    actor modules for the queues listed in the ``DRAMATIQ_QUEUES`` environment
+    variable (comma or space separated) are imported, or all of them if it is unset.
+    The broker consumes from the database given by ``DRAMATIQ_SQLA_URL`` and from
+    the queue shards given by ``DRAMATIQ_SHARD_URLS`` (comma or space separated).
+
+    Returns
+    -------
+    dramatiq.Broker
+        The broker, which is also set as Dramatiq’s global broker.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .dead_letter import DeadLetter
+    from .heartbeat import Heartbeat
+    from .shards import ShardedPostgresBroker
+    from .tracing import Tracing
+
+    # The heartbeat identifies this worker process to the database by the application
+    # name of its connections to the main database and to all queue shards. Its drain
+    # timeout should match the shutdown timeout.
+    heartbeat = Heartbeat(drain_timeout=int(os.environ.get("DRAMATIQ_DRAIN_TIMEOUT", "25000")))
+
+    def _url(url: str) -> str:
+        parts = urllib.parse.urlparse(url)
+        query = urllib.parse.parse_qsl(parts.query) + [("application_name", heartbeat.worker_id)]
+        return parts._replace(query=urllib.parse.urlencode(query)).geturl()
+
+    # Create the Postgres Broker instance that manages reading from and writing
+    # to the message queue (which is implemented by PG) and its shards. Creating
+    # the broker does not connect to the databases, connections are opened when
+    # first used.
+    broker = ShardedPostgresBroker(
+        url=_url(os.environ["DRAMATIQ_SQLA_URL"]),
+        shard_urls=[_url(url) for url in os.environ.get("DRAMATIQ_SHARD_URLS", "").replace(",", " ").split()],
+        schema="data",
+        prefix="dramatiq_",
+    )
+
+    # Record failure details of messages that failed for good. The hooks which run after a message
+    # was processed run in reverse order, so this must come before the Retries middleware.
+    broker.add_middleware(DeadLetter(), before=Retries)
+    broker.add_middleware(heartbeat)
+    # Workflows created by an actor belong to the user of the message being processed.
+    broker.add_middleware(CurrentMessage())
+    # Trace messages and append their spans to the collector file, if any.
+    broker.add_middleware(Tracing(os.environ.get("DRAMATIQ_TRACE_FILE")))
+    dramatiq.set_broker(broker)
+
+    # Importing the actor modules registers the Dramatiq actors with the broker.
+    queues = os.environ.get("DRAMATIQ_QUEUES", "").replace(",", " ").split() or ACTOR_MODULES
+    for module in sorted({ACTOR_MODULES[dramatiq.common.q_name(queue)] for queue in queues}):  # type: ignore[no-untyped-call]
+        importlib.import_module(module)
+
+    assert isinstance(broker, dramatiq.Broker)
+    return broker
@@ -0,0 +1,64 @@
+"""Dead-letter handling for messages which failed for good."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import traceback
+from collections.abc import Iterable
+
+import dramatiq
+import dramatiq_pg.utils
+
+from .shards import pools
+
+
+class DeadLetter(dramatiq.Middleware):
+    """Record why a message failed for good.
+
+    Once a message’s retries are exhausted (or its actor raised one of its ``throws``
+    exceptions) the :class:`dramatiq.middleware.Retries` middleware fails the message,
+    and the broker nacks it. The database then moves the message from the queue table
+    into the dead-letter table. This middleware adds the failure reason and traceback
+    to the message options so that they end up in the dead-letter table as well.
+
+    The broker runs the ``after_process_message`` hooks of its middleware in reverse
+    order, and the Retries middleware fails the message in its hook. This middleware
+    must therefore be added to the broker *before* the Retries middleware.
+    """
+
+    def after_process_message(
+        self,
+        broker: dramatiq.Broker,
+        message: dramatiq.MessageProxy,
+        *,
+        result: object | None = None,
+        exception: BaseException | None = None,
+    ) -> None:
+        """Add failure details to a failed message."""
+        if exception is None or not message.failed:
+            return
+        message.options["reason"] = f"{type(exception).__name__}: {exception}"
+        message.options.setdefault("traceback", "".join(traceback.format_exception(exception, limit=30)))
+
+
+def requeue(message_ids: Iterable[str] | None = None) -> list[str]:
+    """Move dead messages back into the message queue.
+
+    Parameters
+    ----------
+    message_ids: Iterable[str] | None
+        The ids of the dead messages to requeue, or ``None`` to requeue all dead messages.
+
+    Returns
+    -------
+    list[str]
+        The ids of the messages that were requeued.
+    """
+    ids = None if message_ids is None else list(message_ids)
+    requeued: list[str] = []
+    # Dead messages remain in the database which their message came from, including queue shards.
+    for pool in pools(dramatiq.get_broker()):
+        with dramatiq_pg.utils.transaction(pool) as curs:
+            curs.execute("select data.requeue_dead_letters(%s::uuid[])", (ids,))
+            requeued.extend(str(message_id) for (message_id,) in curs)
+    return requeued
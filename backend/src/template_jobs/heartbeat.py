@@ -0,0 +1,107 @@
+"""Worker heartbeats, graceful draining and reclaim of stale messages."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import logging
+import os
+import socket
+import threading
+import uuid
+
+import dramatiq
+import dramatiq_pg.utils
+
+from .shards import pools
+
+logger = logging.getLogger(__name__)
+
+
+class Heartbeat(dramatiq.Middleware):
+    """Register the worker process in the database and keep it alive with heartbeats.
+
+    Every worker process has a unique id which is also used as the application name of
+    all of its database connections, such that the database knows which worker consumed
+    which message. A background thread periodically updates the worker’s heartbeat and
+    reclaims the messages of dead workers, i.e. workers whose heartbeat expired and whose
+    database connections are gone. This way messages of a crashed worker are requeued
+    within seconds instead of waiting for Dramatiq-PG’s infrequent recovery poll.
+
+    When the worker shuts down (e.g. on ``SIGTERM``) it drains: its consumers stop fetching
+    new messages, its heartbeat is extended by the drain timeout, and in-flight messages
+    are given that much time to finish. Prefetched messages are requeued explicitly by the
+    worker and, if in-flight messages didn’t finish, the worker expires itself on shutdown
+    so that the other workers reclaim these messages once this process is gone.
+
+    Parameters
+    ----------
+    interval: int
+        The number of milliseconds between two heartbeats.
+    ttl: int
+        The number of milliseconds after which a worker without heartbeat is considered dead.
+    drain_timeout: int
+        The number of milliseconds a worker is given to drain; should match Dramatiq’s
+        ``--worker-shutdown-timeout`` argument.
+    """
+
+    def __init__(self, *, interval: int = 5_000, ttl: int = 15_000, drain_timeout: int = 25_000) -> None:
+        self.worker_id = f"dramatiq.{uuid.uuid4().hex}"
+        self.interval = interval
+        self.ttl = ttl
+        self.drain_timeout = drain_timeout
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def after_worker_boot(self, broker: dramatiq.Broker, worker: dramatiq.Worker) -> None:
+        """Register the worker and start the heartbeat thread."""
+        self._beat(broker, self.ttl)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(broker,), name="heartbeat", daemon=True)
+        self._thread.start()
+
+    def before_worker_shutdown(self, broker: dramatiq.Broker, worker: dramatiq.Worker) -> None:
+        """Stop fetching new messages and give in-flight messages time to finish."""
+        logger.info("Draining worker %s for %d ms.", self.worker_id, self.drain_timeout)
+        for consumer_thread in worker.consumers.values():
+            consumer_thread.pause()
+        self._stop_thread()
+        self._beat(broker, self.drain_timeout, draining=True)
+
+    def after_worker_shutdown(self, broker: dramatiq.Broker, worker: dramatiq.Worker) -> None:
+        """Expire the worker such that the other workers reclaim messages which did not finish."""
+        self._beat(broker, 0, draining=True)
+
+    def _run(self, broker: dramatiq.Broker) -> None:
+        # Beat every interval until the thread is stopped.
+        for _ in iter(lambda: self._stopped.wait(self.interval / 1000), True):
+            try:
+                self._beat(broker, self.ttl)
+                for message_id in _reclaim(broker):
+                    logger.warning("Reclaimed message %s from a dead worker.", message_id)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Heartbeat of worker %s failed.", self.worker_id)
+
+    def _stop_thread(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _beat(self, broker: dramatiq.Broker, ttl: int, draining: bool = False) -> None:
+        # Every queue shard tracks the workers which consume from it.
+        for pool in pools(broker):
+            with dramatiq_pg.utils.transaction(pool) as curs:
+                curs.execute(
+                    "select data.dramatiq_heartbeat(%s, %s, %s, %s::interval, %s)",
+                    (self.worker_id, socket.gethostname(), os.getpid(), f"{ttl} ms", draining),
+                )
+
+
+def _reclaim(broker: dramatiq.Broker) -> list[str]:
+    # Dead workers may have consumed messages from the main database and from every queue shard.
+    message_ids: list[str] = []
+    for pool in pools(broker):
+        with dramatiq_pg.utils.transaction(pool) as curs:
+            curs.execute("select data.dramatiq_reclaim()")
+            message_ids.extend(str(message_id) for (message_id,) in curs)
+    return message_ids
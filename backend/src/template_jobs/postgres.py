@@ -0,0 +1,58 @@
+"""The Postgres broker of the Dramatiq workers."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import logging
+
+import dramatiq
+import dramatiq.common
+import dramatiq_pg
+import dramatiq_pg.broker
+import dramatiq_pg.utils
+import psycopg2.extras
+import psycopg2.pool
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresBroker(dramatiq_pg.PostgresBroker):  # type: ignore[misc] # pylint: disable=abstract-method
+    """A Dramatiq-PG broker which stores the options that middleware adds when enqueueing a message.
+
+    Dramatiq-PG encodes a message before it emits the ``before_enqueue`` hook, and therefore
+    stores the message without the options which middleware adds in that hook (e.g. the
+    trace of :class:`template_jobs.tracing.Tracing`). This broker encodes the message after
+    the hook instead.
+    """
+
+    def pool_of(self, _message_id: str) -> psycopg2.pool.AbstractConnectionPool:
+        """Return the connection pool of the database which the message came from.
+
+        All messages come from the main database; subclasses which consume from other
+        databases as well override this method.
+        """
+        return self.pool
+
+    @dramatiq_pg.utils.retry_pg  # type: ignore[misc]
+    def enqueue(
+        self, message: dramatiq.Message, *, delay: int | None = None  # type: ignore[type-arg]
+    ) -> dramatiq.Message:  # type: ignore[type-arg]
+        """Enqueue the message into the database which it came from."""
+        if delay:
+            message = message.copy(queue_name=dramatiq.common.dq_name(message.queue_name))  # type: ignore[no-untyped-call]
+            message.options["eta"] = dramatiq.common.current_millis() + delay  # type: ignore[no-untyped-call]
+
+        self.emit_before("enqueue", message, delay)
+        logger.debug("Upserting %s in queue %s.", message.message_id, message.queue_name)
+        with dramatiq_pg.utils.transaction(self.pool_of(message.message_id)) as curs:
+            curs.execute(
+                dramatiq_pg.broker.QUERIES.ENQUEUE,  # pylint: disable=no-member
+                (
+                    message.queue_name,
+                    message.message_id,
+                    psycopg2.extras.Json(dramatiq_pg.utils.tidy4json(message)),
+                    message.message_id,
+                ),
+            )
+        self.emit_after("enqueue", message, delay)
+        return message
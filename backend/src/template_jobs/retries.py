@@ -0,0 +1,22 @@
+"""Retry policies of the Dramatiq actors."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+from typing import NamedTuple
+
+
+class RetryPolicy(NamedTuple):
+    """Retry and backoff options of an actor, see also :class:`dramatiq.middleware.Retries`."""
+
+    max_retries: int
+    min_backoff: int  # Milliseconds.
+    max_backoff: int  # Milliseconds.
+
+
+# Retry policies for the actors of all actor modules. Once an actor exhausted its retries, the
+# message is failed and moved into the dead-letter table from where it can be requeued deliberately.
+RETRY_POLICIES = {
+    "job": RetryPolicy(max_retries=3, min_backoff=1_000, max_backoff=60_000),
+    "process_upload": RetryPolicy(max_retries=5, min_backoff=5_000, max_backoff=300_000),
+}
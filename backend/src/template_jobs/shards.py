@@ -0,0 +1,210 @@
+"""Sharding of the message queue across the main database and additional queue databases."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import logging
+import select
+import time
+from collections.abc import Iterable, Sequence
+
+import dramatiq
+import dramatiq.common
+import dramatiq.results
+import dramatiq_pg
+import dramatiq_pg.broker
+import dramatiq_pg.results
+import dramatiq_pg.utils
+import psycopg2.extras
+import psycopg2.pool
+
+from .postgres import PostgresBroker
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedPostgresBroker(PostgresBroker):  # pylint: disable=abstract-method
+    """A Postgres broker which consumes messages from the main database and any number of queue shards.
+
+    The main database routes the messages which users enqueue into the shards of the messages’
+    queues, and this broker’s consumers consume every queue from the main database and from all
+    shards. A consumed message is acked, retried and its result stored in the database which it
+    was consumed from; new messages that actors send are enqueued into the main database. Note
+    that users, uploads and workflows exist only in the main database, see ``pool``.
+
+    Parameters
+    ----------
+    url: str
+        The URL of the main database.
+    shard_urls: Sequence[str]
+        The URLs of the queue shards, if any.
+    schema: str
+        The database schema of the queue tables.
+    prefix: str
+        The name prefix of the queue tables.
+    """
+
+    def __init__(self, *, url: str, shard_urls: Sequence[str] = (), schema: str, prefix: str) -> None:
+        super().__init__(url=url, results=False, schema=schema, prefix=prefix)
+        self.pools: list[psycopg2.pool.AbstractConnectionPool] = [
+            self.pool,
+            *(dramatiq_pg.utils.make_pool(shard_url) for shard_url in shard_urls),
+        ]
+        # The connection pool of the database that each message being processed came from.
+        self.message_pools: dict[str, psycopg2.pool.AbstractConnectionPool] = {}
+        self.backend = ShardedBackend(broker=self, schema=schema, prefix=prefix)
+        # The broker runs the after hooks in reverse order, i.e. the mapping of a message is dropped
+        # only after the Results middleware stored the message's result into its database.
+        self.add_middleware(_ReleaseMessagePool())
+        self.add_middleware(dramatiq.results.Results(backend=self.backend))  # type: ignore[no-untyped-call]
+
+    def pool_of(self, message_id: str) -> psycopg2.pool.AbstractConnectionPool:
+        """Return the connection pool of the database which the message came from, or of the main database."""
+        return self.message_pools.get(message_id, self.pool)
+
+    def consume(self, queue_name: str, prefetch: int = 1, timeout: int = 30000) -> "ShardedConsumer":
+        """Return a consumer of the queue in the main database and all shards."""
+        consumers = [
+            dramatiq_pg.broker.PostgresConsumer(pool=pool, queue_name=queue_name, prefetch=prefetch, timeout=0)
+            for pool in self.pools
+        ]
+        return ShardedConsumer(self, consumers, prefetch=prefetch, timeout=timeout)
+
+
+class ShardedConsumer(dramatiq.Consumer):
+    """Consume a queue from the main database and all queue shards.
+
+    A Dramatiq-PG consumer waits for the notifications of a single database. This consumer
+    therefore asks the consumers of all databases in turn for a message without waiting, and
+    only if none of them has a message it waits for the notifications of all databases.
+
+    Parameters
+    ----------
+    broker: ShardedPostgresBroker
+        The broker.
+    consumers: Sequence[dramatiq_pg.broker.PostgresConsumer]
+        The consumers of the queue in the main database and in all shards.
+    prefetch: int
+        The maximum number of messages being processed at once.
+    timeout: int
+        The number of milliseconds to wait for a message.
+    """
+
+    def __init__(
+        self,
+        broker: ShardedPostgresBroker,
+        consumers: Sequence[dramatiq_pg.broker.PostgresConsumer],
+        *,
+        prefetch: int,
+        timeout: int,
+    ) -> None:
+        self.broker = broker
+        self.consumers = consumers
+        self.prefetch = prefetch
+        self.timeout = timeout
+        self.misses = 0
+        self._turn = 0
+        # The consumer of each message being processed.
+        self._owners: dict[str, dramatiq_pg.broker.PostgresConsumer] = {}
+
+    def __next__(self) -> dramatiq.MessageProxy | None:
+        """Return the next message of any database, or ``None`` if there was none within the timeout."""
+        # Like Dramatiq-PG, back off while too many messages are being processed.
+        if len(self._owners) >= self.prefetch:
+            self.misses, backoff_ms = dramatiq.common.compute_backoff(  # type: ignore[no-untyped-call]
+                self.misses, max_backoff=1000
+            )
+            time.sleep(backoff_ms / 1000)
+            return None
+        self.misses = 0
+
+        for _ in self.consumers:
+            consumer = self.consumers[self._turn]
+            self._turn = (self._turn + 1) % len(self.consumers)
+            if (message := next(consumer)) is not None:
+                self._owners[message.message_id] = consumer
+                self.broker.message_pools[message.message_id] = consumer.pool
+                assert isinstance(message, dramatiq.MessageProxy)
+                return message
+
+        select.select([consumer.get_listen_conn() for consumer in self.consumers], [], [], self.timeout / 1000)
+        return None
+
+    def ack(self, message: dramatiq.MessageProxy) -> None:
+        """Ack the message in the database which it came from."""
+        self._owners[message.message_id].ack(message)
+        del self._owners[message.message_id]
+
+    def nack(self, message: dramatiq.MessageProxy) -> None:
+        """Nack the message in the database which it came from."""
+        self._owners[message.message_id].nack(message)
+        del self._owners[message.message_id]
+
+    def requeue(self, messages: Iterable[dramatiq.MessageProxy]) -> None:
+        """Requeue the messages in the databases which they came from."""
+        messages = list(messages)
+        for consumer in self.consumers:
+            consumer.requeue([message for message in messages if self._owners.get(message.message_id) is consumer])
+        # No hooks run after requeueing a message, so its mapping is dropped right away.
+        for message in messages:
+            self._owners.pop(message.message_id, None)
+            self.broker.message_pools.pop(message.message_id, None)
+
+    def close(self) -> None:
+        """Close the consumers of all databases."""
+        for consumer in self.consumers:
+            consumer.close()
+
+
+class _ReleaseMessagePool(dramatiq.Middleware):
+    """Forget the database of a message once it was acked or nacked and its result stored."""
+
+    def after_ack(self, broker: dramatiq.Broker, message: dramatiq.MessageProxy) -> None:
+        """Forget the database of the acked message."""
+        assert isinstance(broker, ShardedPostgresBroker)
+        broker.message_pools.pop(message.message_id, None)
+
+    def after_nack(self, broker: dramatiq.Broker, message: dramatiq.MessageProxy) -> None:
+        """Forget the database of the nacked message."""
+        assert isinstance(broker, ShardedPostgresBroker)
+        broker.message_pools.pop(message.message_id, None)
+
+
+class ShardedBackend(dramatiq_pg.results.PostgresBackend):  # type: ignore[misc] # pylint: disable=abstract-method
+    """Store the result of a message in the database which the message came from.
+
+    Results are read from the main database, which is where the messages that actors send
+    are enqueued and therefore where their results are stored. Users read the results of
+    their jobs in the shards through the ``/job`` resource.
+    """
+
+    def __init__(self, *, broker: ShardedPostgresBroker, schema: str, prefix: str) -> None:
+        super().__init__(pool=broker.pool, schema=schema, prefix=prefix)
+        self.broker = broker
+
+    @dramatiq_pg.utils.retry_pg  # type: ignore[misc]
+    def _store(self, key: str, result: object, ttl: int) -> None:
+        with dramatiq_pg.utils.transaction(self.broker.pool_of(key)) as curs:
+            logger.debug("Storing result for %s.", key)
+            curs.execute(
+                dramatiq_pg.results.QUERIES.STORE,  # pylint: disable=no-member
+                (key, psycopg2.extras.Json(dramatiq_pg.utils.tidy4json(result)), f"{ttl} ms"),
+            )
+            if curs.rowcount == 0:
+                raise RuntimeError(f"Can't store result of message {key}.")
+
+
+def pools(broker: dramatiq.Broker) -> list[psycopg2.pool.AbstractConnectionPool]:
+    """Return the connection pools of the broker’s main database and of all queue shards."""
+    if isinstance(broker, ShardedPostgresBroker):
+        return list(broker.pools)
+    assert isinstance(broker, dramatiq_pg.PostgresBroker)
+    return [broker.pool]
+
+
+def pool_of(broker: dramatiq.Broker, message_id: str) -> psycopg2.pool.AbstractConnectionPool:
+    """Return the connection pool of the database which the message came from."""
+    if isinstance(broker, ShardedPostgresBroker):
+        return broker.pool_of(message_id)
+    assert isinstance(broker, dramatiq_pg.PostgresBroker)
+    return broker.pool
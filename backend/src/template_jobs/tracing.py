@@ -0,0 +1,177 @@
+"""End-to-end tracing of messages, from the enqueueing request to the actor."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import contextvars
+import functools
+import json
+import logging
+import secrets
+import threading
+import time
+from typing import NamedTuple
+
+import dramatiq
+
+logger = logging.getLogger(__name__)
+
+
+class Span(NamedTuple):
+    """The span of an actor processing a message, and when the message was enqueued."""
+
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start: float  # Milliseconds since the epoch, like all times below.
+    request_at: float | None
+    enqueued_at: float | None
+
+
+# The span of the message which the current worker thread is processing, if any.
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    """Return the span of the message being processed, or ``None`` outside of an actor."""
+    return _current_span.get()
+
+
+def _now() -> float:
+    return time.time() * 1000
+
+
+@functools.cache
+def _install_record_factory() -> None:
+    """Add the ``trace_id`` attribute to all log records, e.g. for use in a log format."""
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args: object, **kwargs: object) -> logging.LogRecord:
+        record = factory(*args, **kwargs)
+        span = _current_span.get()
+        record.trace_id = "" if span is None else span.trace_id
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+
+
+class Tracing(dramatiq.Middleware):
+    """Trace messages across the request, the queue and the actor.
+
+    Every message carries a ``trace`` object in its options. Messages enqueued by the
+    database (e.g. by ``api.job``) get their trace from ``data.enqueue``: the trace id
+    of the request’s W3C ``traceparent`` header, or a new one, and the start time of
+    the request and the time when the message was enqueued. Messages sent by actors
+    inherit the trace of the message being processed. While a message is processed,
+    the trace id is available as the ``trace_id`` attribute of all log records, and
+    the actor’s span id is stored in the message such that follow-up messages of a
+    workflow become its children.
+
+    Once a message was processed, up to three spans are appended as JSON lines to the
+    collector file: ``enqueue`` (from the start of the request until the message was
+    enqueued), ``queue`` (the time the message waited in the queue) and one named after
+    the actor. Times are in milliseconds since the epoch.
+
+    Parameters
+    ----------
+    filename: str | None
+        The collector file to which spans are appended, or ``None`` to not export spans.
+    """
+
+    def __init__(self, filename: str | None = None) -> None:
+        self.filename = filename
+        self._lock = threading.Lock()
+        _install_record_factory()
+
+    def before_enqueue(self, broker: dramatiq.Broker, message: dramatiq.Message, delay: int) -> None:  # type: ignore[type-arg]
+        """Add the trace to a new message, or restart the queue span of a retried message."""
+        if (trace := message.options.get("trace")) is None:
+            span = _current_span.get()
+            trace = {
+                "trace_id": secrets.token_hex(16) if span is None else span.trace_id,
+                "parent_span_id": None if span is None else span.span_id,
+            }
+        # The options may be shared with the message being processed, so don't modify the trace in place.
+        message.options["trace"] = {
+            **{key: value for key, value in trace.items() if key not in ("request_at", "span_id")},
+            "enqueued_at": _now(),
+        }
+
+    def before_process_message(self, broker: dramatiq.Broker, message: dramatiq.MessageProxy) -> None:
+        """Start the actor’s span."""
+        trace = message.options.get("trace") or {"trace_id": secrets.token_hex(16)}
+        span = Span(
+            trace["trace_id"],
+            secrets.token_hex(8),
+            trace.get("parent_span_id"),
+            _now(),
+            trace.get("request_at"),
+            trace.get("enqueued_at"),
+        )
+        message.options["trace"] = {**trace, "span_id": span.span_id}
+        _current_span.set(span)
+
+    def after_process_message(
+        self,
+        broker: dramatiq.Broker,
+        message: dramatiq.MessageProxy,
+        *,
+        result: object | None = None,
+        exception: BaseException | None = None,
+    ) -> None:
+        """Finish the actor’s span and export the message’s spans."""
+        span = _current_span.get()
+        _current_span.set(None)
+        if span is None:
+            return
+
+        end = _now()
+        attributes: dict[str, object] = {
+            "message_id": message.message_id,
+            "queue_name": message.queue_name,
+            "actor_name": message.actor_name,
+        }
+        spans = []
+        if span.enqueued_at is not None:
+            if span.request_at is not None:
+                spans.append(self._span(span, "enqueue", span.request_at, span.enqueued_at, attributes))
+            spans.append(self._span(span, "queue", span.enqueued_at, span.start, attributes))
+        error = None if exception is None else f"{type(exception).__name__}: {exception}"
+        spans.append(
+            {
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_span_id": span.parent_span_id,
+                "name": message.actor_name,
+                "start": span.start,
+                "end": end,
+                "attributes": attributes,
+                "error": error,
+            }
+        )
+        logger.debug("Processed message %s in %.1f ms (trace %s).", message.message_id, end - span.start, span.trace_id)
+        self._export(spans)
+
+    def after_skip_message(self, broker: dramatiq.Broker, message: dramatiq.MessageProxy) -> None:
+        """Drop the span of a skipped message."""
+        _current_span.set(None)
+
+    @staticmethod
+    def _span(span: Span, name: str, start: float, end: float, attributes: dict[str, object]) -> dict[str, object]:
+        return {
+            "trace_id": span.trace_id,
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": span.parent_span_id,
+            "name": name,
+            "start": start,
+            "end": end,
+            "attributes": attributes,
+        }
+
+    def _export(self, spans: list[dict[str, object]]) -> None:
+        if self.filename is None:
+            return
+        lines = "".join(json.dumps(span) + "\n" for span in spans)
+        with self._lock:
+            with open(self.filename, "a", encoding="utf-8") as file:
+                file.write(lines)
@@ -0,0 +1,75 @@
+"""Asynchronous `Dramatiq <https://github.com/Bogdanp/dramatiq>`_ workers that process uploaded files."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import hashlib
+from collections.abc import Iterator
+
+import dramatiq
+import dramatiq_pg
+import dramatiq_pg.utils
+
+from .retries import RETRY_POLICIES
+
+# When this module run it initializes the Dramatiq actors below.
+# It therefore needs a broker to register the actors with.
+assert dramatiq.broker.global_broker is not None
+
+
+@dramatiq.actor(
+    queue_name="upload_q",
+    store_results=True,
+    max_retries=RETRY_POLICIES["process_upload"].max_retries,
+    min_backoff=RETRY_POLICIES["process_upload"].min_backoff,
+    max_backoff=RETRY_POLICIES["process_upload"].max_backoff,
+)
+def process_upload(upload_id: str) -> dict[str, str | int]:
+    """Process an uploaded file: compute its size and SHA-256 digest from its streamed chunks.
+
+    If processing fails the upload is marked as failed, until a retry of this actor succeeds.
+    """
+    broker = dramatiq.get_broker()
+    assert isinstance(broker, dramatiq_pg.PostgresBroker)
+    try:
+        sha256, size = _digest(upload_id)
+    except Exception:
+        with dramatiq_pg.utils.transaction(broker.pool) as curs:
+            curs.execute("update data.upload set state = 'failed' where id = %s", (upload_id,))
+        raise
+    with dramatiq_pg.utils.transaction(broker.pool) as curs:
+        curs.execute(
+            "update data.upload set state = 'done', size = %s, sha256 = %s where id = %s",
+            (size, sha256, upload_id),
+        )
+    return {"sha256": sha256, "size": size}
+
+
+def _digest(upload_id: str) -> tuple[str, int]:
+    """Return the SHA-256 digest and the size of an uploaded file."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in _iter_chunks(upload_id):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _iter_chunks(upload_id: str) -> Iterator[memoryview]:
+    """Yield the chunks of an uploaded file in order.
+
+    The chunks are read through a server-side cursor one at a time, such that at most
+    one chunk of the file is held in memory regardless of the file’s size.
+    """
+    broker = dramatiq.get_broker()
+    assert isinstance(broker, dramatiq_pg.PostgresBroker)
+    conn = dramatiq_pg.utils.getconn(broker.pool)
+    try:
+        with conn:  # Wraps in a transaction, which a server-side cursor requires.
+            with conn.cursor(name=f"upload_{upload_id.replace('-', '')}") as curs:
+                curs.itersize = 1
+                curs.execute("select data from data.upload_chunk where upload_id = %s order by seq", (upload_id,))
+                for (chunk,) in curs:
+                    yield chunk
+    finally:
+        broker.pool.putconn(conn)
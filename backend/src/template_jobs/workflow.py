@@ -0,0 +1,107 @@
+"""Job workflows: pipelines and groups of messages with a completion callback."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+import json
+from collections.abc import Iterable
+
+import dramatiq
+import dramatiq.middleware
+import dramatiq_pg
+import dramatiq_pg.utils
+
+from .shards import pool_of
+from .tracing import current_span
+
+
+def pipeline(messages: Iterable[dramatiq.Message]) -> str:  # type: ignore[type-arg]
+    """Run messages one after the other, passing each result on to the next message.
+
+    Unlike :class:`dramatiq.pipeline` the workflow is tracked by the database, which
+    enqueues every next message once the previous message is done and appends the
+    previous result to the message’s positional arguments (unless the message’s
+    ``pipe_ignore`` option is set). Clients poll the ``/workflow`` resource with the
+    returned id instead of the individual messages.
+
+    Parameters
+    ----------
+    messages: Iterable[dramatiq.Message]
+        The messages to run, e.g. created with :func:`dramatiq.Actor.message`.
+
+    Returns
+    -------
+    str
+        The id of the new workflow.
+    """
+    return _create_workflow("pipeline", messages)
+
+
+def group(
+    messages: Iterable[dramatiq.Message],  # type: ignore[type-arg]
+    callback: dramatiq.Message | None = None,  # type: ignore[type-arg]
+) -> str:
+    """Run messages concurrently, and the callback once all of them are done.
+
+    The database counts the pending messages of the group and enqueues the callback
+    exactly once, with the list of the messages’ results appended to its positional
+    arguments (unless the callback’s ``pipe_ignore`` option is set).
+
+    Parameters
+    ----------
+    messages: Iterable[dramatiq.Message]
+        The messages to run, e.g. created with :func:`dramatiq.Actor.message`.
+    callback: dramatiq.Message | None
+        The message to run once all other messages are done.
+
+    Returns
+    -------
+    str
+        The id of the new workflow.
+    """
+    return _create_workflow("group", messages, callback)
+
+
+def _step(message: dramatiq.Message) -> dict[str, object]:  # type: ignore[type-arg]
+    return {
+        "queue_name": message.queue_name,
+        "actor_name": message.actor_name,
+        "args": list(message.args),
+        "kwargs": message.kwargs,
+        "options": message.options,
+    }
+
+
+def _create_workflow(
+    kind: str,
+    messages: Iterable[dramatiq.Message],  # type: ignore[type-arg]
+    callback: dramatiq.Message | None = None,  # type: ignore[type-arg]
+) -> str:
+    broker = dramatiq.get_broker()
+    assert isinstance(broker, dramatiq_pg.PostgresBroker)
+
+    # A workflow created by an actor belongs to the user of the message the actor is processing,
+    # which may have come from a queue shard. Workflows themselves live in the main database.
+    current = dramatiq.middleware.CurrentMessage.get_current_message()
+    user_id = None
+    if current is not None:
+        with dramatiq_pg.utils.transaction(pool_of(broker, current.message_id)) as curs:
+            curs.execute("select user_id from data.dramatiq_queue where message_id = %s::uuid", (current.message_id,))
+            (user_id,) = curs.fetchone() or (None,)
+
+    span = current_span()
+    with dramatiq_pg.utils.transaction(broker.pool) as curs:
+        # The workflow’s messages continue the trace of the message being processed.
+        if span is not None:
+            curs.execute("select set_config('app.traceparent', %s, true)", (f"00-{span.trace_id}-{span.span_id}-01",))
+        curs.execute(
+            "select data.create_workflow(%s, %s, %s::jsonb, %s::jsonb)",
+            (
+                user_id,
+                kind,
+                json.dumps([_step(message) for message in messages]),
+                None if callback is None else json.dumps(_step(callback)),
+            ),
+        )
+        (workflow_id,) = curs.fetchone()
+    return str(workflow_id)
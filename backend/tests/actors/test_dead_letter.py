@@ -0,0 +1,112 @@
+"""Collection of tests for the dead-letter middleware."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# Dramatiq’s brokers and workers are mostly untyped.
+# mypy: disable-error-code="no-untyped-call"
+# pylint: disable=missing-function-docstring
+
+import time
+import uuid
+
+import dramatiq
+import dramatiq.brokers.stub
+import dramatiq.middleware
+import pytest
+import sqlalchemy as sa
+
+import template_jobs.broker
+from template_jobs.actors import job
+from template_jobs.dead_letter import DeadLetter, requeue
+from template_jobs.retries import RETRY_POLICIES
+from template_jobs.shards import ShardedPostgresBroker
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(-1)
+
+
+@pytest.fixture(name="message")
+def _message() -> dramatiq.MessageProxy:
+    return dramatiq.MessageProxy(job.message())
+
+
+def test_retry_policy() -> None:
+    assert job.options["max_retries"] == RETRY_POLICIES["job"].max_retries
+    assert job.options["min_backoff"] == RETRY_POLICIES["job"].min_backoff
+    assert job.options["max_backoff"] == RETRY_POLICIES["job"].max_backoff
+
+
+def test_no_exception(message: dramatiq.MessageProxy) -> None:
+    DeadLetter().after_process_message(dramatiq.get_broker(), message, result="done")
+    assert "reason" not in message.options
+    assert "traceback" not in message.options
+
+
+def test_not_failed(message: dramatiq.MessageProxy) -> None:
+    DeadLetter().after_process_message(dramatiq.get_broker(), message, exception=ValueError("retry"))
+    assert "reason" not in message.options
+
+
+def test_middleware_order() -> None:
+    # The Retries middleware fails the message after the DeadLetter middleware looked at it otherwise.
+    middleware = [type(middleware_) for middleware_ in template_jobs.broker.setup().middleware]
+    assert middleware.index(DeadLetter) < middleware.index(dramatiq.middleware.Retries)
+
+
+def test_failed(broker: dramatiq.brokers.stub.StubBroker, worker: dramatiq.Worker) -> None:
+    @dramatiq.actor(broker=broker, max_retries=1, min_backoff=1, max_backoff=1)
+    def fail() -> None:
+        raise ValueError("boom")
+
+    # The message fails for good once its retries are exhausted, and the broker nacks it.
+    fail.send()
+    broker.join(fail.queue_name)
+    worker.join()
+    (message,) = broker.dead_letters
+    assert message.options["retries"] == 2
+    assert message.options["reason"] == "ValueError: boom"
+    assert "ValueError: boom" in message.options["traceback"]
+
+
+def _wait_for(engine: sa.Engine, sql: str, message_id: str) -> None:
+    # Wait for the worker, which processes the message through its own connections.
+    with engine.connect() as conn:
+        for _ in range(200):
+            if conn.execute(sa.text(sql), {"message_id": message_id}).first() is not None:
+                return
+            conn.rollback()
+            time.sleep(0.05)
+    pytest.fail(f"Timed out waiting for message {message_id}")
+
+
+def test_requeue(pg_broker: ShardedPostgresBroker, engine: sa.Engine) -> None:
+    # The actor fails the first time it runs, and has no retries left.
+    queue_name = f"requeue_{uuid.uuid4().hex}"
+    runs: list[int] = []
+
+    @dramatiq.actor(broker=pg_broker, queue_name=queue_name, max_retries=0)
+    def flaky() -> None:
+        runs.append(len(runs))
+        if len(runs) == 1:
+            raise ValueError("boom")
+
+    worker = dramatiq.Worker(pg_broker, worker_timeout=100)
+    worker.start()
+    try:
+        message_id = flaky.send().message_id
+        _wait_for(engine, "select from data.dramatiq_dead_letter where message_id = :message_id", message_id)
+
+        # The requeued message runs again.
+        assert requeue([message_id]) == [message_id]
+        _wait_for(
+            engine, "select from data.dramatiq_queue where message_id = :message_id and state = 'done'", message_id
+        )
+        assert runs == [0, 1]
+    finally:
+        worker.stop()
+        with engine.begin() as conn:
+            conn.execute(
+                sa.text("delete from data.dramatiq_queue where queue_name = :queue_name"), {"queue_name": queue_name}
+            )
@@ -0,0 +1,173 @@
+"""Collection of tests for the worker heartbeat middleware."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# Dramatiq’s brokers and workers are mostly untyped.
+# mypy: disable-error-code="no-untyped-call"
+# pylint: disable=missing-function-docstring
+
+import contextlib
+import logging
+import os
+import threading
+from collections.abc import Iterator
+from typing import NamedTuple
+
+import dramatiq
+import dramatiq_pg.utils
+import pytest
+
+from template_jobs.heartbeat import Heartbeat
+from template_jobs.shards import ShardedPostgresBroker
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(-1)
+
+
+class _Query(NamedTuple):
+    pool: object
+    sql: str
+    params: tuple[object, ...]
+
+
+class _Cursor:
+    """Stands in for a database cursor and records the queries of all databases."""
+
+    def __init__(self, pool: object, queries: list[_Query], reclaimed: list[tuple[str]]) -> None:
+        self.pool = pool
+        self.queries = queries
+        self.rows: list[tuple[str]] = []
+        self.reclaimed = reclaimed
+
+    def execute(self, sql: str, params: tuple[object, ...] = ()) -> None:
+        self.queries.append(_Query(self.pool, sql, params))
+        if "dramatiq_reclaim" in sql:
+            self.rows = list(self.reclaimed)
+
+    def __iter__(self) -> Iterator[tuple[str]]:
+        return iter(self.rows)
+
+
+class _ConsumerThread:
+    """Stands in for a worker’s consumer thread."""
+
+    def __init__(self) -> None:
+        self.paused = False
+
+    def pause(self) -> None:
+        self.paused = True
+
+
+def _worker(broker: ShardedPostgresBroker) -> dramatiq.Worker:
+    # A worker that isn’t started, with one consumer thread per queue.
+    worker = dramatiq.Worker(broker, worker_threads=1)
+    worker.consumers = {"job_q": _ConsumerThread(), "upload_q": _ConsumerThread()}
+    return worker
+
+
+class _Database(NamedTuple):
+    queries: list[_Query]
+    reclaimed: list[tuple[str]]
+    reclaims: threading.Event
+
+
+@pytest.fixture(name="database")
+def _database(monkeypatch: pytest.MonkeyPatch) -> _Database:
+    database = _Database([], [], threading.Event())
+
+    @contextlib.contextmanager
+    def transaction(pool: object) -> Iterator[_Cursor]:
+        yield _Cursor(pool, database.queries, database.reclaimed)
+        if database.queries[-1].sql == "select data.dramatiq_reclaim()":
+            database.reclaims.set()
+
+    monkeypatch.setattr(dramatiq_pg.utils, "transaction", transaction)
+    return database
+
+
+@pytest.fixture(name="sharded_broker")
+def _sharded_broker() -> ShardedPostgresBroker:
+    # Creating the broker doesn’t connect to the databases.
+    return ShardedPostgresBroker(
+        url="postgresql://dramatiq@localhost/template_db",
+        shard_urls=["postgresql://dramatiq@localhost/queue_db"],
+        schema="data",
+        prefix="dramatiq_",
+    )
+
+
+def _beats(database: _Database) -> list[tuple[object, str, bool]]:
+    return [
+        (query.pool, str(query.params[3]), bool(query.params[4]))
+        for query in database.queries
+        if query.sql.startswith("select data.dramatiq_heartbeat(")
+    ]
+
+
+def test_heartbeat(
+    sharded_broker: ShardedPostgresBroker, database: _Database, caplog: pytest.LogCaptureFixture
+) -> None:
+    main, shard = sharded_broker.pools
+    worker = _worker(sharded_broker)
+    heartbeat = Heartbeat(interval=10, ttl=30, drain_timeout=50)
+    database.reclaimed.append(("3fa85f64-5717-4562-b3fc-2c963f66afa6",))
+
+    # The worker registers itself in every database when it boots, then beats and reclaims periodically.
+    with caplog.at_level(logging.WARNING):
+        heartbeat.after_worker_boot(sharded_broker, worker)
+        assert database.reclaims.wait(5)
+        heartbeat.before_worker_shutdown(sharded_broker, worker)
+    assert "Reclaimed message 3fa85f64-5717-4562-b3fc-2c963f66afa6 from a dead worker." in caplog.messages
+    assert {(query.params[0], query.params[2]) for query in database.queries if query.params} == {
+        (heartbeat.worker_id, os.getpid())
+    }
+
+    # Draining pauses the consumers, stops the heartbeat thread and extends the heartbeat.
+    assert all(consumer.paused for consumer in worker.consumers.values())
+    beats = _beats(database)
+    assert beats[:2] == [(main, "30 ms", False), (shard, "30 ms", False)]
+    assert beats[-2:] == [(main, "50 ms", True), (shard, "50 ms", True)]
+    assert {(query.pool, query.sql) for query in database.queries if "reclaim" in query.sql} == {
+        (main, "select data.dramatiq_reclaim()"),
+        (shard, "select data.dramatiq_reclaim()"),
+    }
+
+    # After the shutdown the worker expires itself, and no more heartbeats follow.
+    heartbeat.after_worker_shutdown(sharded_broker, worker)
+    assert _beats(database)[len(beats) :] == [(main, "0 ms", True), (shard, "0 ms", True)]
+    assert heartbeat._thread is None  # pylint: disable=protected-access
+
+
+def test_heartbeat_failure(
+    sharded_broker: ShardedPostgresBroker, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    failed = threading.Event()
+
+    @contextlib.contextmanager
+    def transaction(pool: object) -> Iterator[_Cursor]:
+        if threading.current_thread().name == "heartbeat":
+            failed.set()
+            raise ConnectionError("database is gone")
+        yield _Cursor(pool, [], [])
+
+    monkeypatch.setattr(dramatiq_pg.utils, "transaction", transaction)
+    worker = _worker(sharded_broker)
+    heartbeat = Heartbeat(interval=10)
+
+    # A failing heartbeat is logged and doesn’t stop the heartbeat thread.
+    heartbeat.after_worker_boot(sharded_broker, worker)
+    assert failed.wait(5)
+    failed.clear()
+    assert failed.wait(5)
+    heartbeat.before_worker_shutdown(sharded_broker, worker)
+    assert f"Heartbeat of worker {heartbeat.worker_id} failed." in caplog.messages
+
+
+def test_shutdown_without_boot(sharded_broker: ShardedPostgresBroker, database: _Database) -> None:
+    # Dramatiq shuts a worker down even if another middleware failed its boot.
+    main, shard = sharded_broker.pools
+    heartbeat = Heartbeat(drain_timeout=50)
+    heartbeat.before_worker_shutdown(sharded_broker, _worker(sharded_broker))
+    assert _beats(database) == [(main, "50 ms", True), (shard, "50 ms", True)]
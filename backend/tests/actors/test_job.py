@@ -14,11 +14,11 @@ import pytest
 pytestmark = pytest.mark.order(-1)
 
 
-@pytest.mark.skip("Requires: https://gitlab.com/dalibo/dramatiq-pg/-/issues/42")
-def test_job(broker: dramatiq.Broker) -> None:
+@pytest.mark.usefixtures("worker")
+def test_job(broker: dramatiq.brokers.stub.StubBroker) -> None:
 
-    # The `broker` fixture created the Broker, for which the job
-    # have been registered already.
+    # The `broker` fixture created an in-process stub Broker, for which
+    # the job has been registered already; the `worker` consumes it.
     from template_jobs.actors import job
 
     # Send a message to the async job, and wait for the job to finish.
@@ -0,0 +1,108 @@
+"""Collection of tests for creating workflows from actors."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# Dramatiq’s brokers and workers are mostly untyped.
+# mypy: disable-error-code="no-untyped-call"
+# pylint: disable=missing-function-docstring
+
+import uuid
+from collections.abc import Iterator
+
+import dramatiq
+import dramatiq.middleware
+import pytest
+import sqlalchemy as sa
+
+from template_jobs.actors import job
+from template_jobs.shards import ShardedPostgresBroker
+from template_jobs.tracing import Tracing
+from template_jobs.workflow import group, pipeline
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(-1)
+
+
+@pytest.fixture(name="workflow_ids")
+def _workflow_ids(engine: sa.Engine) -> Iterator[list[str]]:
+    # Workflows are created through the broker’s own connections and therefore committed.
+    workflow_ids: list[str] = []
+    yield workflow_ids
+    with engine.begin() as conn:
+        for workflow_id in workflow_ids:
+            conn.execute(sa.text("delete from data.dramatiq_queue where workflow_id = :id"), {"id": workflow_id})
+            conn.execute(sa.text("delete from data.workflow where id = :id"), {"id": workflow_id})
+
+
+def _messages(engine: sa.Engine, workflow_id: str) -> list[sa.Row[tuple[int | None, dict[str, object]]]]:
+    with engine.connect() as conn:
+        return list(
+            conn.execute(
+                sa.text(
+                    "select user_id, message from data.dramatiq_queue where workflow_id = :id order by message->'args'"
+                ),
+                {"id": workflow_id},
+            )
+        )
+
+
+@pytest.mark.usefixtures("pg_broker")
+def test_pipeline(engine: sa.Engine, workflow_ids: list[str]) -> None:
+    workflow_ids.append(pipeline([job.message_with_options(args=(1,)), job.message_with_options(args=(2,))]))
+
+    # Outside of an actor the workflow belongs to no user, and only its first step is enqueued.
+    with engine.connect() as conn:
+        workflow = conn.execute(
+            sa.text("select user_id, kind, pending, steps from data.workflow where id = :id"), {"id": workflow_ids[0]}
+        ).one()
+    assert workflow.user_id is None
+    assert (workflow.kind, workflow.pending) == ("pipeline", 2)
+    assert [step["args"] for step in workflow.steps] == [[2]]
+    ((user_id, message),) = _messages(engine, workflow_ids[0])
+    assert user_id is None
+    assert (message["queue_name"], message["actor_name"], message["args"]) == ("job_q", "job", [1])
+
+
+def test_group(pg_broker: ShardedPostgresBroker, engine: sa.Engine, user: tuple[str, str, str]) -> None:
+    # The message which the actor is processing belongs to the user.
+    email, _, _ = user
+    current = dramatiq.MessageProxy(dramatiq.Message("job_q", "job", (), {}, {}, message_id=str(uuid.uuid4())))
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            sa.text(
+                """
+                insert into data.dramatiq_queue (user_id, message_id, queue_name, state, mtime, message)
+                    select id, :message_id, 'job_q', 'consumed', now(), '{}' from auth.user where email = :email
+                    returning user_id
+                """
+            ),
+            {"email": email, "message_id": current.message_id},
+        ).scalar_one()
+
+    middleware = [dramatiq.middleware.CurrentMessage(), Tracing()]
+    for middleware_ in middleware:
+        middleware_.before_process_message(pg_broker, current)
+    try:
+        workflow_id = group(
+            [job.message_with_options(args=(1,)), job.message_with_options(args=(2,))],
+            job.message_with_options(pipe_ignore=True),
+        )
+    finally:
+        for middleware_ in reversed(middleware):
+            middleware_.after_process_message(pg_broker, current, result=None)
+
+    # The workflow and its messages belong to the user, and the messages continue the trace;
+    # the user fixture deletes them.
+    with engine.connect() as conn:
+        workflow = conn.execute(
+            sa.text("select user_id, kind, pending, callback from data.workflow where id = :id"), {"id": workflow_id}
+        ).one()
+    assert (workflow.user_id, workflow.kind, workflow.pending) == (user_id, "group", 3)
+    assert workflow.callback["options"] == {"pipe_ignore": True}
+    messages = _messages(engine, workflow_id)
+    assert [(user_id_, message["args"]) for user_id_, message in messages] == [(user_id, [1]), (user_id, [2])]
+    for _, message in messages:
+        assert message["options"]["trace"]["trace_id"] == current.options["trace"]["trace_id"]
+        assert message["options"]["trace"]["parent_span_id"] == current.options["trace"]["span_id"]
@@ -0,0 +1,93 @@
+"""Collection of tests for the ``process_upload`` actor."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import hashlib
+
+import dramatiq_pg.utils
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import pytest
+import sqlalchemy as sa
+from faker import Faker
+
+from template_jobs.shards import ShardedPostgresBroker
+from template_jobs.uploads import process_upload
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(-1)
+
+_CHUNKS = [b"first chunk, ", b"second chunk, ", b"last chunk"]
+
+
+@pytest.fixture(name="upload_id")
+def _upload_id(engine: sa.Engine, user: tuple[str, str, str]) -> str:
+    email, _, _ = user
+    # The actor reads the upload through its own connections, so the upload is committed;
+    # the `user` fixture deletes it together with the user. Chunks are stored out of order.
+    with engine.begin() as conn:
+        upload_id = conn.execute(
+            sa.text(
+                """
+                insert into data.upload (user_id, filename, chunks, state)
+                    select id, 'file.txt', :chunks, 'processing' from auth.user where email = :email
+                    returning id
+                """
+            ),
+            {"email": email, "chunks": len(_CHUNKS)},
+        ).scalar_one()
+        conn.execute(
+            sa.text("insert into data.upload_chunk (upload_id, seq, data) values (:upload_id, :seq, :data)"),
+            [{"upload_id": upload_id, "seq": seq, "data": data} for seq, data in reversed(list(enumerate(_CHUNKS)))],
+        )
+    return str(upload_id)
+
+
+def _upload(engine: sa.Engine, upload_id: str) -> tuple[str, int, str | None]:
+    with engine.connect() as conn:
+        state, size, sha256 = conn.execute(
+            sa.text("select state, size, sha256 from data.upload where id = :id"), {"id": upload_id}
+        ).one()
+    return state, size, sha256
+
+
+def test_process_upload(pg_broker: ShardedPostgresBroker, engine: sa.Engine, upload_id: str) -> None:
+    # The chunks are read in order, one at a time.
+    sha256 = hashlib.sha256(b"".join(_CHUNKS)).hexdigest()
+    size = sum(len(chunk) for chunk in _CHUNKS)
+    assert process_upload.fn(upload_id) == {"sha256": sha256, "size": size}
+
+    # All connections went back into the broker’s pool.
+    assert not pg_broker.pool._used  # pylint: disable=protected-access
+    assert _upload(engine, upload_id) == ("done", size, sha256)
+
+
+@pytest.mark.usefixtures("pg_broker")
+def test_process_unknown_upload(faker: Faker) -> None:
+    assert process_upload.fn(faker.uuid4()) == {"sha256": hashlib.sha256().hexdigest(), "size": 0}
+
+
+@pytest.mark.usefixtures("pg_broker")
+def test_process_upload_failure(engine: sa.Engine, upload_id: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    # The connection which reads the chunks fails, which fails the upload.
+    getconn = dramatiq_pg.utils.getconn
+    errors = iter([psycopg2.OperationalError("connection lost")])
+
+    def failing_getconn(pool: psycopg2.pool.AbstractConnectionPool) -> psycopg2.extensions.connection:
+        if (error := next(errors, None)) is not None:
+            raise error
+        return getconn(pool)
+
+    monkeypatch.setattr(dramatiq_pg.utils, "getconn", failing_getconn)
+    with pytest.raises(psycopg2.OperationalError, match="connection lost"):
+        process_upload.fn(upload_id)
+    assert _upload(engine, upload_id) == ("failed", 0, None)
+
+    # A retry processes the upload again.
+    process_upload.fn(upload_id)
+    assert _upload(engine, upload_id)[0] == "done"
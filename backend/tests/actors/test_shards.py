@@ -0,0 +1,165 @@
+"""Collection of tests for consuming messages from the queue shards."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# Dramatiq’s brokers and workers are mostly untyped.
+# mypy: disable-error-code="no-untyped-call"
+# pylint: disable=missing-function-docstring
+
+import contextlib
+import socket
+import time
+from collections.abc import Iterable, Iterator
+
+import dramatiq
+import dramatiq_pg.utils
+import pytest
+
+from template_jobs.postgres import PostgresBroker
+from template_jobs.shards import ShardedConsumer, ShardedPostgresBroker, pool_of, pools
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(-1)
+
+
+class _Consumer:
+    """Stands in for a Dramatiq-PG consumer of one database."""
+
+    def __init__(self, pool: object) -> None:
+        self.pool = pool
+        self.messages: list[dramatiq.MessageProxy] = []
+        self.acked: list[str] = []
+        self.nacked: list[str] = []
+        self.requeued: list[str] = []
+        self.closed = False
+        self.listen_conn, self.notify_conn = socket.socketpair()
+
+    def __next__(self) -> dramatiq.MessageProxy | None:
+        return self.messages.pop(0) if self.messages else None
+
+    def ack(self, message: dramatiq.MessageProxy) -> None:
+        self.acked.append(message.message_id)
+
+    def nack(self, message: dramatiq.MessageProxy) -> None:
+        self.nacked.append(message.message_id)
+
+    def requeue(self, messages: Iterable[dramatiq.MessageProxy]) -> None:
+        self.requeued.extend(message.message_id for message in messages)
+
+    def close(self) -> None:
+        self.closed = True
+        self.listen_conn.close()
+        self.notify_conn.close()
+
+    def get_listen_conn(self) -> socket.socket:
+        return self.listen_conn
+
+
+class _Cursor:
+    """Stands in for the cursor of a database transaction."""
+
+    rowcount = 1
+
+    def execute(self, query: str, params: object) -> None:
+        pass
+
+
+def _message() -> dramatiq.MessageProxy:
+    return dramatiq.MessageProxy(dramatiq.Message("job_q", "job", (), {}, {}))
+
+
+@pytest.fixture(name="sharded_broker")
+def _sharded_broker() -> ShardedPostgresBroker:
+    # Creating the broker doesn’t connect to the databases.
+    return ShardedPostgresBroker(
+        url="postgresql://dramatiq@localhost/template_db",
+        shard_urls=["postgresql://dramatiq@localhost/queue_db"],
+        schema="data",
+        prefix="dramatiq_",
+    )
+
+
+@pytest.fixture(name="consumers")
+def _consumers(sharded_broker: ShardedPostgresBroker) -> Iterator[list[_Consumer]]:
+    consumers = [_Consumer(pool) for pool in sharded_broker.pools]
+    yield consumers
+    for consumer in consumers:
+        consumer.close()
+
+
+def test_pools(sharded_broker: ShardedPostgresBroker) -> None:
+    main, shard = sharded_broker.pools
+    assert main is sharded_broker.pool
+    assert shard is not main
+    assert pools(sharded_broker) == [main, shard]
+    assert pool_of(sharded_broker, "unknown") is main
+
+
+def test_pools_unsharded() -> None:
+    broker = PostgresBroker(url="postgresql://dramatiq@localhost/template_db", results=False)
+    assert pools(broker) == [broker.pool]
+    assert pool_of(broker, "unknown") is broker.pool
+
+
+def test_consume_in_turn(
+    sharded_broker: ShardedPostgresBroker, consumers: list[_Consumer], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    main, shard = consumers
+    main.messages = [_message(), _message()]
+    shard.messages = [_message()]
+    expected = [main.messages[0], shard.messages[0], main.messages[1]]
+    consumer = ShardedConsumer(sharded_broker, consumers, prefetch=10, timeout=100)
+    assert [next(consumer) for _ in expected] == expected
+
+    # Acks, retries and results of a message go to the database the message came from.
+    assert pool_of(sharded_broker, expected[1].message_id) is shard.pool
+    consumer.ack(expected[0])
+    consumer.nack(expected[1])
+    assert (main.acked, shard.nacked) == ([expected[0].message_id], [expected[1].message_id])
+
+    # The worker emits the after_nack hook once the message was nacked, and the Results middleware
+    # stores the failure into the shard before the mapping of the message is dropped.
+    stored: list[object] = []
+
+    @contextlib.contextmanager
+    def transaction(pool: object) -> Iterator[_Cursor]:
+        stored.append(pool)
+        yield _Cursor()
+
+    monkeypatch.setattr(dramatiq_pg.utils, "transaction", transaction)
+    dramatiq.actor(lambda: None, actor_name="job", queue_name="job_q", broker=sharded_broker, store_results=True)
+    expected[1].fail()
+    sharded_broker.emit_after("nack", expected[1])
+    assert stored == [shard.pool]
+    assert pool_of(sharded_broker, expected[1].message_id) is main.pool
+
+    consumer.requeue([expected[2]])
+    assert (main.requeued, shard.requeued) == ([expected[2].message_id], [])
+
+
+def test_prefetch(sharded_broker: ShardedPostgresBroker, consumers: list[_Consumer]) -> None:
+    main, shard = consumers
+    shard.messages = [_message(), _message()]
+    consumer = ShardedConsumer(sharded_broker, consumers, prefetch=1, timeout=100)
+    message = next(consumer)
+    assert message is not None
+    assert next(consumer) is None
+    assert len(shard.messages) == 1
+    consumer.ack(message)
+    assert next(consumer) is not None
+    assert not main.acked
+
+
+def test_wait_for_notifies(sharded_broker: ShardedPostgresBroker, consumers: list[_Consumer]) -> None:
+    consumer = ShardedConsumer(sharded_broker, consumers, prefetch=1, timeout=2000)
+
+    # Without messages, the consumer waits for a notification of any database.
+    start = time.perf_counter()
+    consumers[1].notify_conn.send(b"notify")
+    assert next(consumer) is None
+    assert time.perf_counter() - start < 1
+
+    consumer.close()
+    assert all(consumer_.closed for consumer_ in consumers)
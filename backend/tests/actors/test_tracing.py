@@ -0,0 +1,135 @@
+"""Collection of tests for the tracing middleware."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# Dramatiq’s brokers and workers are mostly untyped.
+# mypy: disable-error-code="no-untyped-call"
+# pylint: disable=missing-function-docstring
+
+import json
+import logging
+import pathlib
+
+import dramatiq
+import dramatiq.brokers.stub
+import pytest
+import sqlalchemy as sa
+
+from template_jobs.postgres import PostgresBroker
+from template_jobs.tracing import Tracing
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(-1)
+
+
+@pytest.fixture(name="trace_file")
+def collector_file(broker: dramatiq.brokers.stub.StubBroker, tmp_path: pathlib.Path) -> pathlib.Path:
+    tracing = next(middleware for middleware in broker.middleware if isinstance(middleware, Tracing))
+    tracing.filename = str(tmp_path / "traces.jsonl")
+    return tmp_path / "traces.jsonl"
+
+
+def _spans(trace_file: pathlib.Path) -> list[dict[str, object]]:
+    return [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.usefixtures("worker")
+def test_spans(broker: dramatiq.brokers.stub.StubBroker, trace_file: pathlib.Path) -> None:
+    message = broker.enqueue(dramatiq.Message("job_q", "job", (), {}, {}))
+    broker.join("job_q")
+
+    queue, actor = _spans(trace_file)
+    assert queue["name"] == "queue"
+    assert actor["name"] == "job"
+    assert queue["trace_id"] == actor["trace_id"] == message.options["trace"]["trace_id"]
+    assert actor["parent_span_id"] is None
+    assert actor["error"] is None
+    assert queue["end"] == actor["start"]
+    assert (
+        queue["attributes"]
+        == actor["attributes"]
+        == {
+            "message_id": message.message_id,
+            "queue_name": "job_q",
+            "actor_name": "job",
+        }
+    )
+
+
+def test_request_span(broker: dramatiq.brokers.stub.StubBroker, trace_file: pathlib.Path) -> None:
+    # Messages enqueued by the database carry the start time of the request, and
+    # the actor’s span id is stored in the message when it’s being processed.
+    message = dramatiq.MessageProxy(dramatiq.Message("job_q", "job", (), {}, {}))
+    message.options["trace"] = {"trace_id": "0af7651916cd43dd8448eb211c80319c", "request_at": 1.0, "enqueued_at": 2.0}
+    tracing = Tracing(str(trace_file))
+    tracing.before_process_message(broker, message)
+    tracing.after_process_message(broker, message, result="done")
+
+    enqueue, queue, actor = _spans(trace_file)
+    assert (enqueue["name"], enqueue["start"], enqueue["end"]) == ("enqueue", 1.0, 2.0)
+    assert (queue["name"], queue["start"], queue["end"]) == ("queue", 2.0, actor["start"])
+    assert message.options["trace"]["span_id"] == actor["span_id"]
+    assert {span["trace_id"] for span in (enqueue, queue, actor)} == {"0af7651916cd43dd8448eb211c80319c"}
+
+
+def test_propagation(
+    broker: dramatiq.brokers.stub.StubBroker, trace_file: pathlib.Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    @dramatiq.actor(broker=broker, queue_name="trace_q")
+    def child() -> None:
+        logging.getLogger(__name__).info("child")
+
+    @dramatiq.actor(broker=broker, queue_name="trace_q")
+    def parent() -> None:
+        logging.getLogger(__name__).info("parent")
+        child.send()
+
+    worker = dramatiq.Worker(broker, worker_timeout=100)
+    worker.start()
+    try:
+        with caplog.at_level(logging.INFO, logger=__name__):
+            parent.send()
+            broker.join("trace_q")
+    finally:
+        worker.stop()
+
+    actors = {span["name"]: span for span in _spans(trace_file) if span["name"] in {"parent", "child"}}
+    assert actors["parent"]["trace_id"] == actors["child"]["trace_id"]
+    assert actors["child"]["parent_span_id"] == actors["parent"]["span_id"]
+    trace_ids = [record.trace_id for record in caplog.records]  # type: ignore[attr-defined]
+    assert trace_ids == [actors["parent"]["trace_id"]] * 2
+
+
+def test_failed_span(broker: dramatiq.brokers.stub.StubBroker, trace_file: pathlib.Path) -> None:
+    @dramatiq.actor(broker=broker, queue_name="trace_q", max_retries=0)
+    def fail() -> None:
+        raise ValueError("boom")
+
+    worker = dramatiq.Worker(broker, worker_timeout=100)
+    worker.start()
+    try:
+        fail.send()
+        broker.join("trace_q")
+    finally:
+        worker.stop()
+
+    actor = _spans(trace_file)[-1]
+    assert actor["name"] == "fail"
+    assert actor["error"] == "ValueError: boom"
+
+
+@pytest.mark.parametrize("delay", [None, 60_000])
+def test_stored_trace(pg_broker: PostgresBroker, engine: sa.Engine, delay: int | None) -> None:
+    # The Postgres broker stores the trace which the middleware adds when enqueueing the message.
+    pg_broker.add_middleware(Tracing())
+    message = pg_broker.enqueue(dramatiq.Message("trace_q", "trace", (), {}, {}), delay=delay)
+    with engine.begin() as conn:
+        stored = conn.execute(
+            sa.text("delete from data.dramatiq_queue where message_id = :message_id returning queue_name, message"),
+            {"message_id": message.message_id},
+        ).one()
+    assert stored.queue_name == message.queue_name
+    assert stored.message["options"]["trace"] == message.options["trace"]
+    assert set(stored.message["options"]["trace"]) == {"trace_id", "parent_span_id", "enqueued_at"}
@@ -18,19 +18,6 @@ pytestmark = pytest.mark.order(2)
 _URL = "http://localhost:3000/rpc/login"
 
 
-@pytest.fixture(name="signup")
-def _signup(faker: Faker) -> tuple[str, str]:
-    email = faker.email()
-    password = faker.password()
-
-    response = requests.post(
-        "http://localhost:3000/rpc/signup", data={"email": email, "password": password}, timeout=0.5
-    )
-    assert response.status_code == 200
-
-    return email, password
-
-
 def test_invalid_no_payload() -> None:
     response = requests.post(_URL, data={}, timeout=0.5)
     assert response.status_code == 404
@@ -55,8 +42,8 @@ def test_wrong_password() -> None:
     pass
 
 
-def test_valid(signup: tuple[str, str]) -> None:
-    email, password = signup
+def test_valid(user: tuple[str, str, str]) -> None:
+    email, password, _ = user
     response = requests.post(_URL, data={"email": email, "password": password}, timeout=0.5)
     assert response.status_code == 200
     assert "token" in response.json()
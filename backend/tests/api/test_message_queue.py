@@ -10,30 +10,11 @@ import time
 
 import pytest
 import requests
-from faker import Faker
 
 # Glogal ordering of test modules.
 pytestmark = pytest.mark.order(4)
 
 
-@pytest.fixture(name="bearer")
-def _signup_login(faker: Faker) -> str:
-    email = faker.email()
-    password = faker.password()
-
-    response = requests.post(
-        "http://localhost:3000/rpc/signup", data={"email": email, "password": password}, timeout=0.5
-    )
-    assert response.status_code == 200
-    response = requests.post(
-        "http://localhost:3000/rpc/login", data={"email": email, "password": password}, timeout=0.5
-    )
-    assert response.status_code == 200
-
-    json = response.json()
-    return f"Bearer {json['token']}"
-
-
 def test_job(bearer: str) -> None:
 
     # Post to the `job` endpoint which pushes a message into the queue
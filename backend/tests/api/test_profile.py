@@ -20,24 +20,6 @@ pytestmark = pytest.mark.order(3)
 _URL = "http://localhost:3000/profile"
 
 
-@pytest.fixture(name="bearer")
-def _signup_login(faker: Faker) -> str:
-    email = faker.email()
-    password = faker.password()
-
-    response = requests.post(
-        "http://localhost:3000/rpc/signup", data={"email": email, "password": password}, timeout=0.5
-    )
-    assert response.status_code == 200
-    response = requests.post(
-        "http://localhost:3000/rpc/login", data={"email": email, "password": password}, timeout=0.5
-    )
-    assert response.status_code == 200
-
-    json = response.json()
-    return f"Bearer {json['token']}"
-
-
 def test_get_no_bearer() -> None:
     response = requests.get(_URL, timeout=0.5)
     assert response.status_code == 401
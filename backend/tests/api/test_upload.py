@@ -0,0 +1,124 @@
+"""Collection of tests for the chunked ``/rpc/upload_*`` endpoints and the ``/upload`` resource."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import base64
+import hashlib
+import time
+
+import pytest
+import requests
+from faker import Faker
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(4)
+
+# A 1x1 pixel PNG image.
+_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+@pytest.fixture(name="upload_id")
+def start_upload(bearer: str) -> str:
+    response = requests.post(
+        "http://localhost:3000/rpc/upload_start",
+        data={"filename": "image.png"},
+        headers={"Authorization": bearer, "Accept": "application/vnd.pgrst.object+json"},
+        timeout=0.5,
+    )
+    assert response.status_code == 200
+    return str(response.json()["upload_id"])
+
+
+def _upload_chunk(bearer: str, upload_id: str, seq: int, chunk: bytes) -> requests.Response:
+    return requests.post(
+        "http://localhost:3000/rpc/upload_chunk",
+        data=chunk,
+        headers={
+            "Authorization": bearer,
+            "Content-Type": "application/octet-stream",
+            "Upload-Id": upload_id,
+            "Upload-Chunk": str(seq),
+        },
+        timeout=0.5,
+    )
+
+
+def test_unknown_upload(faker: Faker, bearer: str) -> None:
+    response = _upload_chunk(bearer, faker.uuid4(), 0, b"data")
+    assert response.status_code == 404
+
+    response = requests.post(
+        "http://localhost:3000/rpc/upload_finish",
+        data={"upload_id": faker.uuid4()},
+        headers={"Authorization": bearer},
+        timeout=0.5,
+    )
+    assert response.status_code == 404
+
+
+def test_chunk_too_large(bearer: str, upload_id: str) -> None:
+    response = _upload_chunk(bearer, upload_id, 0, bytes(1024 * 1024 + 1))
+    assert response.status_code == 413
+
+
+def test_duplicate_chunk(bearer: str, upload_id: str) -> None:
+    response = _upload_chunk(bearer, upload_id, 0, b"data")
+    assert response.status_code == 200
+    response = _upload_chunk(bearer, upload_id, 0, b"data")
+    assert response.status_code == 409
+
+
+def test_incomplete_upload(bearer: str, upload_id: str) -> None:
+    response = _upload_chunk(bearer, upload_id, 1, b"data")
+    assert response.status_code == 200
+
+    response = requests.post(
+        "http://localhost:3000/rpc/upload_finish",
+        data={"upload_id": upload_id},
+        headers={"Authorization": bearer},
+        timeout=0.5,
+    )
+    assert response.status_code == 404
+
+
+def test_upload(faker: Faker, bearer: str, upload_id: str) -> None:
+    chunks = [_PNG, faker.binary(length=1024), faker.binary(length=512)]
+    for seq, chunk in enumerate(chunks):
+        response = _upload_chunk(bearer, upload_id, seq, chunk)
+        assert response.status_code == 200
+
+    response = requests.post(
+        "http://localhost:3000/rpc/upload_finish",
+        data={"upload_id": upload_id},
+        headers={"Authorization": bearer, "Accept": "application/vnd.pgrst.object+json"},
+        timeout=0.5,
+    )
+    assert response.status_code == 200
+    assert response.json()["job_id"]
+
+    # Poll the upload until the worker processed it.
+    for _ in range(5):
+        response = requests.get(
+            f"http://localhost:3000/upload?upload_id=eq.{upload_id}",
+            headers={"Authorization": bearer, "Accept": "application/vnd.pgrst.object+json"},
+            timeout=0.5,
+        )
+        assert response.status_code == 200
+
+        upload = response.json()
+        assert upload["mime_type"] == "image/png"
+        if upload["state"] == "done":
+            assert upload["size"] == sum(len(chunk) for chunk in chunks)
+            assert upload["sha256"] == hashlib.sha256(b"".join(chunks)).hexdigest()
+            break
+
+        time.sleep(0.5)
+
+    else:
+        pytest.fail("Upload was not processed before timeout!")
@@ -0,0 +1,114 @@
+"""Collection of tests for the ``/rpc/workflow`` endpoint and the ``/workflow`` resource."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import json
+import time
+
+import pytest
+import requests
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(4)
+
+# The `job` actor takes no arguments, so it must ignore the results of previous steps.
+_JOB = {"actor_name": "job", "options": {"pipe_ignore": True}}
+
+
+def _start_workflow(bearer: str, payload: dict[str, object]) -> requests.Response:
+    return requests.post(
+        "http://localhost:3000/rpc/workflow",
+        data=json.dumps(payload),
+        headers={
+            "Authorization": bearer,
+            "Content-Type": "application/json",
+            "Accept": "application/vnd.pgrst.object+json",
+        },
+        timeout=0.5,
+    )
+
+
+def test_unknown_actor(bearer: str) -> None:
+    response = _start_workflow(bearer, {"kind": "pipeline", "steps": [_JOB, {"actor_name": "process_upload"}]})
+    assert response.status_code == 400
+
+    response = _start_workflow(bearer, {"kind": "group", "steps": [_JOB], "callback": {"actor_name": "nope"}})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"pipe_target": {"queue_name": "upload_q", "actor_name": "process_upload", "args": [], "kwargs": {}}},
+        {"on_failure": "process_upload"},
+        {"pipe_ignore": True, "eta": 0},
+    ],
+)
+def test_unsupported_option(bearer: str, options: dict[str, object]) -> None:
+    # Clients must not run actors which aren't listed through the options of a step.
+    response = _start_workflow(bearer, {"kind": "pipeline", "steps": [{"actor_name": "job", "options": options}]})
+    assert response.status_code == 400
+
+    response = _start_workflow(bearer, {"kind": "group", "steps": [_JOB], "callback": {**_JOB, "options": options}})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    ("kind", "result"),
+    [
+        ("pipeline", "done"),
+        ("group", ["done", "done"]),
+    ],
+)
+def test_workflow(bearer: str, kind: str, result: object) -> None:
+    response = _start_workflow(bearer, {"kind": kind, "steps": [_JOB, _JOB]})
+    assert response.status_code == 200
+    workflow_id = response.json()["workflow_id"]
+
+    # Poll the workflow, not its individual jobs, until it's done.
+    for _ in range(10):
+        response = requests.get(
+            f"http://localhost:3000/workflow?workflow_id=eq.{workflow_id}",
+            headers={"Authorization": bearer, "Accept": "application/vnd.pgrst.object+json"},
+            timeout=0.5,
+        )
+        assert response.status_code == 200
+
+        workflow = response.json()
+        if workflow["state"] == "done":
+            assert workflow["pending"] == 0
+            assert len(workflow["job_ids"]) == 2
+            assert workflow["result"] == result
+            break
+
+        time.sleep(0.5)
+
+    else:
+        pytest.fail("Workflow did not finish before timeout!")
+
+
+def test_group_callback(bearer: str) -> None:
+    response = _start_workflow(bearer, {"kind": "group", "steps": [_JOB, _JOB, _JOB], "callback": _JOB})
+    assert response.status_code == 200
+    workflow_id = response.json()["workflow_id"]
+
+    for _ in range(10):
+        response = requests.get(
+            f"http://localhost:3000/workflow?workflow_id=eq.{workflow_id}",
+            headers={"Authorization": bearer, "Accept": "application/vnd.pgrst.object+json"},
+            timeout=0.5,
+        )
+        workflow = response.json()
+        if workflow["state"] == "done":
+            assert len(workflow["job_ids"]) == 4
+            assert workflow["result"] == "done"
+            break
+
+        time.sleep(0.5)
+
+    else:
+        pytest.fail("Workflow did not finish before timeout!")
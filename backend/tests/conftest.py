@@ -3,13 +3,39 @@
 # Copyright (c) 2025-2025
 # This code is licensed under MIT license, see LICENSE.md for details.
 
+# Dramatiq’s brokers and workers are mostly untyped.
+# mypy: disable-error-code="no-untyped-call"
+
+import os
 import random
+from collections.abc import Iterator
+from typing import NamedTuple
 
+import dramatiq
+import dramatiq.brokers.stub
+import dramatiq.middleware
+import dramatiq.results
+import dramatiq.results.backends
 import pytest
+import sqlalchemy as sa
+from faker import Faker
+
+import template_jobs.broker
+from template_jobs.dead_letter import DeadLetter
+from template_jobs.shards import ShardedPostgresBroker
+from template_jobs.tracing import Tracing
+
+# Set up the broker which imports the actor modules to make sure that all
+# code is loaded to coverage tracking.
+template_jobs.broker.setup()
+
 
-# Import the broker module which imports the actor module to make sure
-# that all code is loaded to coverage tracking.
-import template_jobs.broker  # noqa: F401 # pylint: disable=unused-import
+class User(NamedTuple):
+    """A user seeded into the database for a test."""
+
+    email: str
+    password: str
+    bearer: str
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -22,3 +48,137 @@ def faker_session_locale() -> list[str]:
 def faker_seed() -> float:
     """Override the Faker fixture’s default RNG seed."""
     return random.random()  # nosec B311
+
+
+@pytest.fixture(name="engine", scope="session")
+def db_engine() -> Iterator[sa.Engine]:
+    """Return an engine that connects to the test database as the superuser.
+
+    Tests may run in parallel (using ``pytest -n``) and all workers share the same
+    database and schemas because PostgREST serves the fixed ``api`` schema. Workers are
+    isolated by their own users (and therewith row-level security), or by rolling back
+    their transactions.
+    """
+    engine = sa.create_engine(os.environ["POSTGRES_SQLA_URL"])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(name="db")
+def db_connection(engine: sa.Engine) -> Iterator[sa.Connection]:
+    """Return a connection whose transaction is rolled back after the test."""
+    with engine.connect() as conn:
+        with conn.begin() as trans:
+            yield conn
+            trans.rollback()
+
+
+@pytest.fixture(name="unsharded")
+def _no_queue_shards(db: sa.Connection) -> None:
+    """Unregister all queue shards within the ``db`` transaction.
+
+    Messages which the test enqueues then remain in the main database where the test can
+    read them, even if the development setup registered shards for their queues.
+    """
+    db.execute(sa.text("delete from data.queue_shard"))
+
+
+@pytest.fixture(name="user")
+def seed_user(faker: Faker, engine: sa.Engine, worker_id: str) -> Iterator[User]:
+    """Seed a user directly into the database and mint the user’s JWT.
+
+    Unlike signing up and logging in through the API this takes a single round trip
+    to the database. The user must be committed to be visible to PostgREST, and is
+    therefore deleted (together with the user’s jobs, workflows and uploads) after the test.
+    """
+    email = f"{worker_id}.{faker.email()}"
+    password = faker.password()
+    with engine.begin() as conn:
+        user_id, token = conn.execute(
+            sa.text(
+                """
+                with u as (
+                    insert into auth.user (email, password) values (:email, :password) returning id, role, email
+                )
+                select
+                    u.id,
+                    sign(
+                        json_build_object('role', u.role, 'email', u.email, 'exp', extract(epoch from now())::integer + 60*60),
+                        current_setting('app.jwt_secret')
+                    )
+                    from u
+                """
+            ),
+            {"email": email, "password": password},
+        ).one()
+    yield User(email, password, f"Bearer {token}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("delete from data.dramatiq_queue where user_id = :id"), {"id": user_id})
+        conn.execute(sa.text("delete from data.dramatiq_dead_letter where user_id = :id"), {"id": user_id})
+        conn.execute(sa.text("delete from data.workflow where user_id = :id"), {"id": user_id})
+        conn.execute(sa.text("delete from data.upload where user_id = :id"), {"id": user_id})
+        conn.execute(sa.text("delete from auth.user where id = :id"), {"id": user_id})
+
+
+@pytest.fixture(name="bearer")
+def user_bearer(user: User) -> str:
+    """Return the HTTP ``Authorization`` header value for a seeded user."""
+    return user.bearer
+
+
+@pytest.fixture(name="broker")
+def stub_broker() -> Iterator[dramatiq.brokers.stub.StubBroker]:
+    """Return an in-process broker with all actors registered.
+
+    The actors were declared with the Postgres broker when the ``template_jobs.broker``
+    was set up. For the duration of the test they’re moved over to an in-memory
+    stub broker (with an in-memory result backend), which is also set as the global broker.
+    """
+    pg_broker = dramatiq.get_broker()
+    actors = [pg_broker.get_actor(name) for name in pg_broker.get_declared_actors()]
+
+    broker = dramatiq.brokers.stub.StubBroker()
+    broker.add_middleware(dramatiq.results.Results(backend=dramatiq.results.backends.StubBackend()))
+    broker.add_middleware(DeadLetter(), before=dramatiq.middleware.Retries)
+    broker.add_middleware(Tracing())
+    for actor in actors:
+        actor.broker = broker
+        broker.declare_actor(actor)
+    broker.emit_after("process_boot")
+    dramatiq.set_broker(broker)
+
+    yield broker
+
+    broker.flush_all()
+    broker.close()
+    for actor in actors:
+        actor.broker = pg_broker
+    dramatiq.set_broker(pg_broker)
+
+
+@pytest.fixture(name="pg_broker")
+def postgres_broker() -> Iterator[ShardedPostgresBroker]:
+    """Return a Postgres broker which connects to the test database as the superuser.
+
+    Unlike the stub broker, this broker enqueues messages into and actors read from the
+    test database, where everything is committed; tests therefore clean up after themselves.
+    The broker has no actors and is set as the global broker for the duration of the test,
+    such that actor functions can be called directly.
+    """
+    pg_broker = dramatiq.get_broker()
+    broker = ShardedPostgresBroker(url=os.environ["POSTGRES_SQLA_URL"], schema="data", prefix="dramatiq_")
+    dramatiq.set_broker(broker)
+
+    yield broker
+
+    broker.pool.closeall()
+    dramatiq.set_broker(pg_broker)
+
+
+@pytest.fixture(name="worker")
+def stub_worker(broker: dramatiq.brokers.stub.StubBroker) -> Iterator[dramatiq.Worker]:
+    """Return a started worker which processes messages of the stub broker in-process."""
+    worker = dramatiq.Worker(broker, worker_timeout=100)
+    worker.start()
+    yield worker
+    worker.stop()
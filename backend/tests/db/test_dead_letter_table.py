@@ -0,0 +1,126 @@
+"""Collection of tests for the dead-letter table and its requeue function."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+
+@pytest.fixture(name="message_id")
+def rejected_message(db: sa.Connection) -> str:
+    message_id = str(uuid.uuid4())
+    message = {
+        "queue_name": "job_q",
+        "actor_name": "job",
+        "args": [],
+        "kwargs": {},
+        "options": {"retries": 3, "reason": "ValueError: boom", "traceback": "Traceback ..."},
+        "message_id": message_id,
+        "message_timestamp": 0,
+    }
+    db.execute(
+        sa.text(
+            """
+            insert into data.dramatiq_queue (message_id, queue_name, state, mtime, message)
+                values (:message_id, 'job_q', 'consumed', now(), :message)
+            """
+        ),
+        {"message_id": message_id, "message": json.dumps(message)},
+    )
+    db.execute(
+        sa.text("update data.dramatiq_queue set state = 'rejected' where message_id = :message_id"),
+        {"message_id": message_id},
+    )
+    return message_id
+
+
+def test_rejected_moves_to_dead_letter(db: sa.Connection, message_id: str) -> None:
+    queued = db.execute(
+        sa.text("select count(*) from data.dramatiq_queue where message_id = :message_id"), {"message_id": message_id}
+    ).scalar_one()
+    assert queued == 0
+
+    actor_name, retries, reason, traceback = db.execute(
+        sa.text(
+            """
+            select actor_name, retries, reason, traceback
+                from data.dramatiq_dead_letter
+                where message_id = :message_id
+            """
+        ),
+        {"message_id": message_id},
+    ).one()
+    assert actor_name == "job"
+    assert retries == 3
+    assert reason == "ValueError: boom"
+    assert traceback == "Traceback ..."
+
+    # The dead message doesn't duplicate the columns of the dead-letter table.
+    message = db.execute(
+        sa.text("select message from data.dramatiq_dead_letter where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert message == {"args": [], "kwargs": {}, "options": {}, "message_timestamp": 0}
+
+
+def test_requeue(db: sa.Connection, message_id: str) -> None:
+    requeued = db.execute(
+        sa.text("select data.requeue_dead_letters(array[:message_id]::uuid[])"), {"message_id": message_id}
+    ).scalars()
+    assert [str(id_) for id_ in requeued] == [message_id]
+
+    dead = db.execute(
+        sa.text("select count(*) from data.dramatiq_dead_letter where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert dead == 0
+
+    state, message = db.execute(
+        sa.text("select state, message from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).one()
+    assert state == "queued"
+    assert message == {
+        "queue_name": "job_q",
+        "actor_name": "job",
+        "args": [],
+        "kwargs": {},
+        "options": {},
+        "message_id": message_id,
+        "message_timestamp": 0,
+    }
+
+
+def test_result(db: sa.Connection, message_id: str) -> None:
+    # The Results middleware stores the exception of the dead message the way Dramatiq-PG does.
+    db.execute(
+        sa.text(
+            """
+            insert into data.dramatiq_queue (queue_name, message_id, state, result, result_ttl)
+                values ('__RQ__', :message_id, 'done', :result, now() + interval '1 day')
+                on conflict (message_id) do update set result = excluded.result, result_ttl = excluded.result_ttl
+            """
+        ),
+        {"message_id": message_id, "result": json.dumps({"__exc__": "ValueError"})},
+    )
+
+    # The result is kept with the dead message instead of in the queue.
+    queued = db.execute(
+        sa.text("select count(*) from data.dramatiq_queue where message_id = :message_id"), {"message_id": message_id}
+    ).scalar_one()
+    assert queued == 0
+    result = db.execute(
+        sa.text("select result from data.dramatiq_dead_letter where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert result == {"__exc__": "ValueError"}
@@ -0,0 +1,81 @@
+"""Collection of tests for the compact and compressed storage of messages."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+
+def _upsert(db: sa.Connection, message_id: str, state: str, options: dict[str, object]) -> None:
+    # Like Dramatiq-PG's enqueue (and its nack for the rejected state).
+    message = {"queue_name": "job_q", "actor_name": "job", "args": [], "kwargs": {}, "options": options}
+    db.execute(
+        sa.text(
+            """
+            insert into data.dramatiq_queue (message_id, queue_name, state, mtime, message)
+                values (:message_id, 'job_q', :state, now(), :message)
+                on conflict (message_id) do update set state = excluded.state, message = excluded.message
+            """
+        ),
+        {"message_id": message_id, "state": state, "message": json.dumps({**message, "message_id": message_id})},
+    )
+
+
+def test_compression(db: sa.Connection) -> None:
+    compression = db.execute(
+        sa.text(
+            """
+            select attname, attcompression, attstorage
+                from pg_attribute
+                where attrelid = 'data.dramatiq_queue'::regclass and attname in ('message', 'result')
+            """
+        )
+    ).all()
+    assert sorted(compression) == [("message", "l", "m"), ("result", "l", "m")]
+
+
+def test_retry_without_traceback(db: sa.Connection) -> None:
+    message_id = str(uuid.uuid4())
+    _upsert(db, message_id, "queued", {})
+    _upsert(db, message_id, "queued", {"retries": 1, "traceback": "Traceback ..."})
+    options = db.execute(
+        sa.text("select message->'options' from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert options == {"retries": 1}
+
+
+def test_rejected_with_traceback(db: sa.Connection) -> None:
+    message_id = str(uuid.uuid4())
+    _upsert(db, message_id, "consumed", {})
+    db.execute(
+        sa.text("update data.dramatiq_queue set state = 'rejected', message = :message where message_id = :message_id"),
+        {
+            "message_id": message_id,
+            "message": json.dumps(
+                {
+                    "queue_name": "job_q",
+                    "actor_name": "job",
+                    "args": [],
+                    "kwargs": {},
+                    "options": {"retries": 3, "traceback": "Traceback ..."},
+                    "message_id": message_id,
+                }
+            ),
+        },
+    )
+    traceback = db.execute(
+        sa.text("select traceback from data.dramatiq_dead_letter where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert traceback == "Traceback ..."
@@ -0,0 +1,85 @@
+"""Collection of tests for the traces of enqueued messages."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import json
+import re
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+pytestmark = [
+    # Glogal ordering of test modules.
+    pytest.mark.order(5),
+    # Read the messages from the main database.
+    pytest.mark.usefixtures("unsharded"),
+]
+
+_TRACE_ID = "0af7651916cd43dd8448eb211c80319c"
+_SPAN_ID = "b7ad6b7169203331"
+
+
+def _trace(db: sa.Connection, message_id: uuid.UUID) -> dict[str, object]:
+    trace: dict[str, object] = db.execute(
+        sa.text("select message->'options'->'trace' from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    return trace
+
+
+def test_new_trace(db: sa.Connection) -> None:
+    message_id = db.execute(sa.text("select data.enqueue(null, 'job_q', 'job')")).scalar_one()
+    trace = _trace(db, message_id)
+    assert re.fullmatch("[0-9a-f]{32}", str(trace["trace_id"]))
+    assert "parent_span_id" not in trace
+    assert isinstance(trace["request_at"], (int, float))
+    assert isinstance(trace["enqueued_at"], (int, float))
+    assert trace["request_at"] <= trace["enqueued_at"]
+
+
+def test_traceparent_header(db: sa.Connection) -> None:
+    # PostgREST passes the request headers as a setting.
+    headers = json.dumps({"traceparent": f"00-{_TRACE_ID}-{_SPAN_ID}-01"})
+    db.execute(sa.text("select set_config('request.headers', :headers, true)"), {"headers": headers})
+    message_id = db.execute(sa.text("select data.enqueue(null, 'job_q', 'job')")).scalar_one()
+    trace = _trace(db, message_id)
+    assert trace["trace_id"] == _TRACE_ID
+    assert trace["parent_span_id"] == _SPAN_ID
+
+
+def test_workflow_trace(db: sa.Connection) -> None:
+    steps = [{"queue_name": "job_q", "actor_name": "job", "options": {"pipe_ignore": True}}] * 2
+    workflow_id = db.execute(
+        sa.text("select data.create_workflow(null, 'pipeline', :steps)"), {"steps": json.dumps(steps)}
+    ).scalar_one()
+    (message_id,) = db.execute(
+        sa.text("select job_ids from data.workflow where id = :workflow_id"), {"workflow_id": workflow_id}
+    ).scalar_one()
+
+    # The worker stores its actor span in the message when it acks the message.
+    db.execute(
+        sa.text("update data.dramatiq_queue set state = 'consumed' where message_id = :message_id"),
+        {"message_id": message_id},
+    )
+    db.execute(
+        sa.text(
+            """
+            update data.dramatiq_queue
+                set state = 'done', message = jsonb_set(message, '{options,trace,span_id}', to_jsonb(cast(:span_id as text)))
+                where message_id = :message_id
+            """
+        ),
+        {"message_id": message_id, "span_id": _SPAN_ID},
+    )
+
+    _, next_message_id = db.execute(
+        sa.text("select job_ids from data.workflow where id = :workflow_id"), {"workflow_id": workflow_id}
+    ).scalar_one()
+    trace = _trace(db, next_message_id)
+    assert trace["trace_id"] == _trace(db, message_id)["trace_id"]
+    assert trace["parent_span_id"] == _SPAN_ID
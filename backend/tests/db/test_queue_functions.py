@@ -0,0 +1,61 @@
+"""Collection of tests for the functions which the main database and the queue shards share."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import os
+from collections.abc import Iterator
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+# The definitions of all functions in the `data` schema and of all triggers of the queue table.
+_DEFINITIONS = """
+    select 'function', p.proname, pg_get_functiondef(p.oid)
+        from pg_proc p
+        where p.pronamespace = 'data'::regnamespace
+    union all
+    select 'trigger', t.tgname, pg_get_triggerdef(t.oid)
+        from pg_trigger t
+        where t.tgrelid = 'data.dramatiq_queue'::regclass and not t.tgisinternal
+"""
+
+
+@pytest.fixture(name="queue_engine", scope="module")
+def queue_db_engine() -> Iterator[sa.Engine]:
+    engine = sa.create_engine(os.environ["POSTGRES_QUEUE_SQLA_URL"])
+    yield engine
+    engine.dispose()
+
+
+def _definitions(engine: sa.Engine) -> dict[tuple[str, str], str]:
+    with engine.connect() as conn:
+        return {(kind, name): definition for kind, name, definition in conn.execute(sa.text(_DEFINITIONS))}
+
+
+def test_shared_definitions(engine: sa.Engine, queue_engine: sa.Engine) -> None:
+    # The migrations of both databases create these with the same definitions.
+    main = _definitions(engine)
+    shard = _definitions(queue_engine)
+    shared = main.keys() & shard.keys()
+    assert shared >= {
+        ("function", "dramatiq_queue_state"),
+        ("function", "dramatiq_queue_compact"),
+        ("function", "dramatiq_dead_letter"),
+        ("function", "dramatiq_dead_letter_result"),
+        ("function", "requeue_dead_letters"),
+        ("function", "dramatiq_heartbeat"),
+        ("function", "dramatiq_reclaim"),
+        ("trigger", "dramatiq_queue_state"),
+        ("trigger", "dramatiq_queue_compact"),
+        ("trigger", "dramatiq_dead_letter"),
+        ("trigger", "dramatiq_dead_letter_result"),
+    }
+    for key in sorted(shared):
+        assert main[key] == shard[key], key
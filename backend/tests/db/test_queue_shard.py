@@ -0,0 +1,55 @@
+"""Collection of tests for the routing of messages into queue shards."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+
+@pytest.mark.usefixtures("unsharded")
+def test_enqueue_without_shards(db: sa.Connection) -> None:
+    message_id = db.execute(sa.text("select data.enqueue(null, 'job_q', 'job')")).scalar_one()
+    queue_name = db.execute(
+        sa.text("select queue_name from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert queue_name == "job_q"
+
+
+def test_enqueue_into_shard(db: sa.Connection) -> None:
+    shards = db.execute(sa.text("select shard from data.queue_shard where queue_name = 'job_q' order by shard")).all()
+    if not shards:
+        pytest.skip("No queue shards registered for job_q")
+
+    # Messages are routed by user id; the remote insert is rolled back together with the test’s transaction.
+    user_id = 7
+    message_id = db.execute(sa.text("select data.enqueue(:user_id, 'job_q', 'job')"), {"user_id": user_id}).scalar_one()
+    assert not db.execute(
+        sa.text("select from data.dramatiq_queue where message_id = :message_id"), {"message_id": message_id}
+    ).all()
+    (shard,) = shards[user_id % len(shards)]
+    user_id_ = db.execute(
+        sa.text(f'select user_id from "{shard}".dramatiq_queue where message_id = :message_id'),  # nosec B608
+        {"message_id": message_id},
+    ).scalar_one()
+    assert user_id_ == user_id
+
+
+def test_shard_jobs_without_user(db: sa.Connection) -> None:
+    assert not db.execute(sa.text("select * from data.shard_jobs()")).all()
+
+
+@pytest.mark.parametrize("shard", ["data", "shard_1; drop schema data", "Shard_1"])
+def test_invalid_shard_name(db: sa.Connection, shard: str) -> None:
+    with pytest.raises(sa.exc.DBAPIError, match="invalid shard name"):
+        db.execute(
+            sa.text("select data.add_queue_shard(:shard, '{job_q}', 'localhost', 5432, 'queue_db', 'queue_router')"),
+            {"shard": shard},
+        )
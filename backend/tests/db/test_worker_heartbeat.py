@@ -0,0 +1,100 @@
+"""Collection of tests for worker heartbeats and the reclaim of stale messages."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+
+@pytest.fixture(name="worker_id")
+def dead_worker(db: sa.Connection) -> str:
+    worker_id = f"dramatiq.{uuid.uuid4().hex}"
+    db.execute(
+        sa.text("select data.dramatiq_heartbeat(:worker_id, 'localhost', 42, interval '-1 second')"),
+        {"worker_id": worker_id},
+    )
+    return worker_id
+
+
+@pytest.fixture(name="message_id")
+def consumed_message(db: sa.Connection, worker_id: str) -> str:
+    message_id = str(uuid.uuid4())
+    db.execute(
+        sa.text(
+            """
+            insert into data.dramatiq_queue (message_id, queue_name, state, mtime, message)
+                values (:message_id, 'job_q', 'queued', now(), :message)
+            """
+        ),
+        {"message_id": message_id, "message": json.dumps({"message_id": message_id})},
+    )
+
+    # Consume the message as if this connection belonged to the worker.
+    db.execute(sa.text("select set_config('application_name', :worker_id, true)"), {"worker_id": worker_id})
+    db.execute(
+        sa.text("update data.dramatiq_queue set state = 'consumed' where message_id = :message_id"),
+        {"message_id": message_id},
+    )
+    db.execute(sa.text("select set_config('application_name', 'pytest', true)"))
+    return message_id
+
+
+def test_heartbeat(db: sa.Connection, worker_id: str) -> None:
+    db.execute(
+        sa.text("select data.dramatiq_heartbeat(:worker_id, 'localhost', 42, interval '1 minute', true)"),
+        {"worker_id": worker_id},
+    )
+    db.execute(
+        sa.text("select data.dramatiq_heartbeat(:worker_id, 'localhost', 42, interval '1 minute')"),
+        {"worker_id": worker_id},
+    )
+    expired, draining = db.execute(
+        sa.text("select expires_at < now(), draining from data.dramatiq_worker where worker_id = :worker_id"),
+        {"worker_id": worker_id},
+    ).one()
+    assert not expired
+    assert draining
+
+
+def test_consumed_message(db: sa.Connection, worker_id: str, message_id: str) -> None:
+    consumer = db.execute(
+        sa.text("select worker_id from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+    assert consumer == worker_id
+
+
+def test_reclaim(db: sa.Connection, worker_id: str, message_id: str) -> None:
+    reclaimed = db.execute(sa.text("select data.dramatiq_reclaim()")).scalars()
+    assert message_id in [str(id_) for id_ in reclaimed]
+
+    state, consumer = db.execute(
+        sa.text("select state, worker_id from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).one()
+    assert state == "queued"
+    assert consumer is None
+
+    workers = db.execute(
+        sa.text("select count(*) from data.dramatiq_worker where worker_id = :worker_id"), {"worker_id": worker_id}
+    ).scalar_one()
+    assert workers == 0
+
+
+def test_reclaim_alive(db: sa.Connection, worker_id: str, message_id: str) -> None:
+    db.execute(
+        sa.text("select data.dramatiq_heartbeat(:worker_id, 'localhost', 42, interval '1 minute')"),
+        {"worker_id": worker_id},
+    )
+    reclaimed = db.execute(sa.text("select data.dramatiq_reclaim()")).scalars()
+    assert message_id not in [str(id_) for id_ in reclaimed]
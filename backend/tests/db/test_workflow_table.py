@@ -0,0 +1,178 @@
+"""Collection of tests for job workflows, i.e. pipelines and groups with a callback."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+
+def _step(actor_name: str, *args: object, pipe_ignore: bool = False) -> dict[str, object]:
+    return {
+        "queue_name": "job_q",
+        "actor_name": actor_name,
+        "args": list(args),
+        "options": {"pipe_ignore": pipe_ignore},
+    }
+
+
+def _create_workflow(
+    db: sa.Connection, kind: str, steps: list[dict[str, object]], callback: dict[str, object] | None = None
+) -> str:
+    workflow_id = db.execute(
+        sa.text("select data.create_workflow(null, :kind, :steps, :callback)"),
+        {"kind": kind, "steps": json.dumps(steps), "callback": None if callback is None else json.dumps(callback)},
+    ).scalar_one()
+    return str(workflow_id)
+
+
+def _finish(db: sa.Connection, message_id: uuid.UUID, result: object, state: str = "done") -> None:
+    # Consume and ack (or reject) the message the way Dramatiq-PG does.
+    db.execute(
+        sa.text("update data.dramatiq_queue set state = 'consumed' where message_id = :message_id"),
+        {"message_id": message_id},
+    )
+    db.execute(
+        sa.text("update data.dramatiq_queue set state = :state, result = :result where message_id = :message_id"),
+        {"message_id": message_id, "state": state, "result": json.dumps(result)},
+    )
+
+
+def _workflow(db: sa.Connection, workflow_id: str) -> sa.Row[tuple[str, int, list[uuid.UUID], object]]:
+    return db.execute(
+        sa.text("select state, pending, job_ids, result from data.workflow where id = :workflow_id"),
+        {"workflow_id": workflow_id},
+    ).one()
+
+
+def _args(db: sa.Connection, message_id: uuid.UUID) -> object:
+    return db.execute(
+        sa.text("select message->'args' from data.dramatiq_queue where message_id = :message_id"),
+        {"message_id": message_id},
+    ).scalar_one()
+
+
+def test_pipeline(db: sa.Connection) -> None:
+    workflow_id = _create_workflow(db, "pipeline", [_step("a", 1), _step("b", 2)], _step("c", pipe_ignore=True))
+    state, pending, job_ids, _ = _workflow(db, workflow_id)
+    assert state == "running"
+    assert pending == 3
+    assert len(job_ids) == 1
+
+    # Finishing a step enqueues the next step with the previous result.
+    _finish(db, job_ids[0], "x")
+    _, pending, job_ids, _ = _workflow(db, workflow_id)
+    assert pending == 2
+    assert len(job_ids) == 2
+    assert _args(db, job_ids[1]) == [2, "x"]
+
+    _finish(db, job_ids[1], "y")
+    _, _, job_ids, _ = _workflow(db, workflow_id)
+    assert _args(db, job_ids[2]) == []
+
+    _finish(db, job_ids[2], "z")
+    state, pending, _, result = _workflow(db, workflow_id)
+    assert state == "done"
+    assert pending == 0
+    assert result == "z"
+
+
+def test_group_callback(db: sa.Connection) -> None:
+    workflow_id = _create_workflow(db, "group", [_step("a"), _step("b"), _step("c")], _step("d"))
+    _, pending, job_ids, _ = _workflow(db, workflow_id)
+    assert pending == 4
+    assert len(job_ids) == 3
+
+    # The callback is enqueued exactly once, after the last message of the group finished,
+    # with the messages’ results in the order of the messages.
+    for message_id, job_result in zip(reversed(job_ids), ["c", "b", "a"]):
+        _, _, ids, _ = _workflow(db, workflow_id)
+        assert len(ids) == 3
+        _finish(db, message_id, job_result)
+
+    _, pending, job_ids, _ = _workflow(db, workflow_id)
+    assert pending == 1
+    assert len(job_ids) == 4
+    assert _args(db, job_ids[3]) == [["a", "b", "c"]]
+
+    _finish(db, job_ids[3], "d")
+    state, pending, _, result = _workflow(db, workflow_id)
+    assert state == "done"
+    assert result == "d"
+
+
+def test_group(db: sa.Connection) -> None:
+    workflow_id = _create_workflow(db, "group", [_step("a"), _step("b")])
+    _, _, job_ids, _ = _workflow(db, workflow_id)
+    for message_id, job_result in zip(job_ids, [1, 2]):
+        _finish(db, message_id, job_result)
+
+    state, pending, job_ids, result = _workflow(db, workflow_id)
+    assert state == "done"
+    assert pending == 0
+    assert len(job_ids) == 2
+    assert result == [1, 2]
+
+
+def test_failed_workflow(db: sa.Connection) -> None:
+    workflow_id = _create_workflow(db, "group", [_step("a"), _step("b")], _step("c"))
+    _, _, job_ids, _ = _workflow(db, workflow_id)
+    _finish(db, job_ids[0], None, state="rejected")
+    _finish(db, job_ids[1], "b")
+
+    # The other message of the group counts as finished, but the callback isn't enqueued.
+    state, pending, job_ids, _ = _workflow(db, workflow_id)
+    assert state == "failed"
+    assert pending == 2
+    assert len(job_ids) == 2
+
+
+def test_requeued_workflow(db: sa.Connection) -> None:
+    workflow_id = _create_workflow(db, "group", [_step("a"), _step("b")], _step("c"))
+    _, _, job_ids, _ = _workflow(db, workflow_id)
+    _finish(db, job_ids[0], None, state="rejected")
+    _finish(db, job_ids[1], "b")
+
+    # Requeueing the dead message continues the workflow, which enqueues the callback once the
+    # message finished.
+    db.execute(sa.text("select data.requeue_dead_letters(array[:message_id]::uuid[])"), {"message_id": job_ids[0]})
+    state, pending, _, _ = _workflow(db, workflow_id)
+    assert state == "running"
+    assert pending == 2
+
+    _finish(db, job_ids[0], "a")
+    state, pending, job_ids, _ = _workflow(db, workflow_id)
+    assert state == "running"
+    assert pending == 1
+    assert _args(db, job_ids[2]) == [["a", "b"]]
+
+    _finish(db, job_ids[2], "c")
+    state, _, _, result = _workflow(db, workflow_id)
+    assert state == "done"
+    assert result == "c"
+
+
+def test_empty_workflow(db: sa.Connection) -> None:
+    with pytest.raises(sa.exc.DBAPIError):
+        _create_workflow(db, "group", [])
+
+
+def test_requeued_workflow_with_dead_messages(db: sa.Connection) -> None:
+    workflow_id = _create_workflow(db, "group", [_step("a"), _step("b")], _step("c"))
+    _, _, job_ids, _ = _workflow(db, workflow_id)
+    _finish(db, job_ids[0], None, state="rejected")
+    _finish(db, job_ids[1], None, state="rejected")
+
+    # The workflow continues only once none of its messages is dead anymore.
+    for message_id, state in zip(job_ids, ["failed", "running"]):
+        db.execute(sa.text("select data.requeue_dead_letters(array[:message_id]::uuid[])"), {"message_id": message_id})
+        assert _workflow(db, workflow_id)[0] == state
@@ -0,0 +1,121 @@
+"""Collection of tests that measure the size and throughput of the message queue table."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import os
+import time
+from typing import NamedTuple
+
+import pytest
+import sqlalchemy as sa
+
+# Glogal ordering of test modules.
+pytestmark = pytest.mark.order(5)
+
+# The number of messages to enqueue and dequeue; set to a million for a proper benchmark
+# and run the test with `-s` to see the measurements.
+_ROWS = int(os.environ.get("QUEUE_BENCHMARK_ROWS", "10000"))
+
+# Messages as `data.enqueue` creates them: every tenth message is a retry which carries the
+# traceback of its previous attempt, and every hundredth message has a larger argument.
+_MESSAGES = """
+    select
+        m.message_id,
+        'job_q',
+        'queued',
+        now(),
+        jsonb_build_object(
+            'queue_name', 'job_q',
+            'actor_name', 'job',
+            'args', case when m.i % 100 = 0 then jsonb_build_array(repeat(md5(m.i::text), 64)) else jsonb_build_array(m.i) end,
+            'kwargs', jsonb_build_object(),
+            'options', jsonb_build_object(
+                'trace', jsonb_build_object(
+                    'trace_id', md5(m.i::text),
+                    'request_at', extract(epoch from now()) * 1000,
+                    'enqueued_at', extract(epoch from clock_timestamp()) * 1000
+                )
+            ) || case
+                when m.i % 10 = 0
+                then jsonb_build_object('retries', 1, 'traceback', repeat(e'  File "actors.py", line 42, in job\\n', 30))
+                else jsonb_build_object()
+            end,
+            'message_id', m.message_id,
+            'message_timestamp', extract(epoch from now())::bigint
+        )
+        from (select i, gen_random_uuid() as message_id from generate_series(1, :rows) as i) m
+"""
+
+
+class _Measurement(NamedTuple):
+    size: int  # Bytes, including indexes and TOAST.
+    enqueue: float  # Messages per second.
+    dequeue: float  # Messages per second.
+
+
+def _measure(db: sa.Connection, table: str) -> _Measurement:
+    start = time.perf_counter()
+    db.execute(
+        sa.text(f"insert into {table} (message_id, queue_name, state, mtime, message) {_MESSAGES}"),  # nosec B608
+        {"rows": _ROWS},
+    )
+    enqueue = _ROWS / (time.perf_counter() - start)
+    size = db.execute(sa.text("select pg_total_relation_size(cast(:table as regclass))"), {"table": table}).scalar_one()
+
+    # Consume all messages the way Dramatiq-PG does: mark them consumed and read them whole.
+    start = time.perf_counter()
+    db.execute(
+        sa.text(
+            f"""
+            with consumed as (
+                update {table} set state = 'consumed' where state = 'queued' returning message::text as message
+            )
+            select sum(octet_length(message)) from consumed
+            """  # nosec B608
+        )
+    )
+    dequeue = _ROWS / (time.perf_counter() - start)
+    return _Measurement(size, enqueue, dequeue)
+
+
+def test_queue_storage(db: sa.Connection) -> None:
+    # Before: the queue table with Postgres' default storage of jsonb columns.
+    db.execute(
+        sa.text(
+            """
+            create temporary table queue_before
+                (like data.dramatiq_queue including defaults including constraints including indexes)
+            """
+        )
+    )
+
+    # After: the queue table with its compression, storage, TOAST settings and compaction trigger.
+    reloptions = db.execute(
+        sa.text("select reloptions from pg_class where oid = 'data.dramatiq_queue'::regclass")
+    ).scalar_one()
+    assert reloptions
+    db.execute(
+        sa.text(
+            f"""
+            create temporary table queue_after (like data.dramatiq_queue including all) with ({", ".join(reloptions)});
+            create trigger queue_after_compact
+                before insert or update of message on queue_after
+                for each row
+                when (new.state = 'queued' and new.message->'options' ? 'traceback')
+                execute function data.dramatiq_queue_compact();
+            """
+        )
+    )
+
+    before = _measure(db, "queue_before")
+    after = _measure(db, "queue_after")
+    for name, measurement in (("before", before), ("after", after)):
+        print(
+            f"{name}: {_ROWS} messages, {measurement.size / 2**20:.1f} MiB, "
+            f"enqueue {measurement.enqueue:.0f}/s, dequeue {measurement.dequeue:.0f}/s"
+        )
+    assert after.size < before.size
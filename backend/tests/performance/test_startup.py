@@ -0,0 +1,81 @@
+"""Collection of tests that track the startup time of Dramatiq worker processes."""
+
+# Copyright (c) 2025-2025
+# This code is licensed under MIT license, see LICENSE.md for details.
+
+# flake8: noqa: D103
+# pylint: disable=missing-function-docstring
+
+import os
+import subprocess  # nosec B404
+import sys
+
+import pytest
+
+from template_jobs.broker import ACTOR_MODULES
+
+pytestmark = [
+    # Glogal ordering of test modules.
+    pytest.mark.order(-1),
+    # The time budgets below don't hold while other test processes compete for the CPU,
+    # so these tests run serially (see the `pytest-serial` hook in .pre-commit-config.yaml).
+    pytest.mark.skipif("PYTEST_XDIST_WORKER" in os.environ, reason="runs serially with -n 0"),
+]
+
+# Budget (in microseconds) for importing and setting up the broker in a fresh
+# interpreter, as measured by `python -X importtime`. This is generous to keep
+# the test stable on slow CI runners; it's meant to catch import regressions.
+_IMPORT_BUDGET_US = 200_000
+_SETUP_BUDGET_US = 1_000_000
+
+
+def _import_times(code: str, queues: str | None = None) -> tuple[dict[str, int], set[str]]:
+    """Run the code in a new interpreter and return the cumulative times of top-level imports, and all imported modules.
+
+    Note that modules imported using :func:`importlib.import_module` are not reported by ``-X importtime``
+    though their own imports are; the returned set of imported modules is therefore taken from ``sys.modules``.
+    """
+    env = dict(os.environ)
+    env.pop("DRAMATIQ_QUEUES", None)
+    if queues is not None:
+        env["DRAMATIQ_QUEUES"] = queues
+    proc = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", f"{code}; import sys; print(*sys.modules)"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines look like this: `import time:  self [us] | cumulative | imported package` where
+    # nested imports are indented by two more spaces.
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit() and not module.startswith("  "):
+            times[module.strip()] = int(cumulative)
+    return times, set(proc.stdout.split())
+
+
+def test_import_broker() -> None:
+    times, modules = _import_times("import template_jobs.broker")
+    assert times["template_jobs.broker"] < _IMPORT_BUDGET_US
+    for module in ("dramatiq_pg", "psycopg2", "sqlalchemy", *ACTOR_MODULES.values()):
+        assert module not in modules
+
+
+def test_setup_broker() -> None:
+    times, modules = _import_times("import template_jobs.broker; template_jobs.broker.setup()")
+    assert sum(times.values()) < _SETUP_BUDGET_US
+    assert "sqlalchemy" not in modules
+    for module in ACTOR_MODULES.values():
+        assert module in modules
+
+
+@pytest.mark.parametrize("queue_name", ACTOR_MODULES)
+def test_setup_broker_queue(queue_name: str) -> None:
+    _, modules = _import_times("import template_jobs.broker; template_jobs.broker.setup()", queue_name)
+    for module in ACTOR_MODULES.values():
+        assert (module in modules) == (module == ACTOR_MODULES[queue_name])